@@ -0,0 +1,396 @@
+"""Module to order and display strings in an array-backed heap.
+
+Provides the functions of the `heap` module used to build, mutate and
+display a heap, for comparing the two stores in `bench.py`.  Engines,
+batched comparisons, snapshots, binary files, search and top items are
+only provided by `heap`.
+
+Functions
+---------
+init(is_higher: CompareStr, preorder: Iterator[str] = iter(['']))
+    Initialize the heap.
+to_preorder() -> Iterator[str]
+    Return the pre-order sequence of strings in the heap.
+insert(key: str) -> int:
+    Insert key into heap and return its index.
+insert_many(keys: list[str])
+    Insert keys into heap, merging them together first.
+delete(idx: int) -> str
+    Delete node with given pre-order index and return its key.
+move(idx: int) -> tuple[str, int]:
+    Delete then reinsert key of node with given pre-order index.
+promote(idx: int) -> tuple[str, int]
+    Merge subtree of node with given pre-order index with the root.
+rename(idx: int, name: str) -> str
+    Rename item with given pre-order index and return its previous key.
+key_at(idx: int) -> str
+    Return key of item with given pre-order index.
+is_empty() -> bool
+    Check if heap is empty.
+is_valid_idx(idx: int) -> bool
+    Check if number is a valid pre-order index.
+size() -> int
+    Return the number of items in the heap.
+display(start: int = 0, count: Optional[int] = None) -> Iterator[str]
+    Return the strings used to visually display the heap.
+
+Notes
+-----
+Implements the same pairing heap as `heap` with its default `multipass`
+engine, making the same comparisons in the same order, one at a time.
+Nodes are integer slots in parallel arrays and are relinked in place
+instead of being copied, so an operation allocates at most one slot.  Freed
+slots are kept on a free list threaded through the sibling array.
+
+The application only uses `heap`.  Its undo history, workspaces and
+autosaves keep snapshots that share nodes with the current heap, which
+relinking nodes in place would corrupt.  Keeping them here would need a
+copy of the arrays or a log of every relink for each operation.
+"""
+
+from array import array
+from typing import Iterator, Optional
+
+from heap import CompareStr
+
+_NULL = -1
+
+# Global Variables
+_is_higher: CompareStr = None
+_root: int = _NULL
+_free: int = _NULL      # Head of the free list
+_keys: list[str] = []
+_child = array('i')     # First child
+_sibling = array('i')   # Next sibling
+_parent = array('i')    # Node whose child or sibling this node is
+_size = array('i')      # Number of nodes in child-sibling subtree
+
+
+def _new_node(key: str) -> int:
+    # Return a fresh leaf node with the given key, reusing a free slot.
+    global _free
+    if _free == _NULL:
+        _keys.append(key)
+        for a in (_child, _sibling, _parent):
+            a.append(_NULL)
+        _size.append(1)
+        return len(_keys) - 1
+    node = _free
+    _free = _sibling[node]
+    _keys[node] = key
+    _child[node] = _sibling[node] = _parent[node] = _NULL
+    _size[node] = 1
+    return node
+
+
+def _free_node(node: int):
+    # Return a node's slot to the free list.
+    global _free
+    _keys[node] = ''
+    _sibling[node] = _free
+    _free = node
+
+
+def _subtree_size(node: int) -> int:
+    # Return the size of a possibly null subtree.
+    return _size[node] if node != _NULL else 0
+
+
+def _update_size(node: int):
+    # Recompute the size of a node from its child and sibling.
+    _size[node] = (1 + _subtree_size(_child[node])
+                   + _subtree_size(_sibling[node]))
+
+
+def _set_child(node: int, child: int):
+    # Link a first child to a node.
+    _child[node] = child
+    if child != _NULL:
+        _parent[child] = node
+
+
+def _set_sibling(node: int, sibling: int):
+    # Link a next sibling to a node.
+    _sibling[node] = sibling
+    if sibling != _NULL:
+        _parent[sibling] = node
+
+
+def init(is_higher: CompareStr,
+         preorder: Iterator[str] = iter([''])):
+    """Initialize the heap.
+
+    Must be called before the other functions in the module are used.
+
+    Parameters
+    ----------
+    is_higher : CompareStr
+        Callback function used to order strings indicating whether the first
+        string has a higher priority than the second.
+    preorder : MaybeIterStr, default=iter([''])
+        A pre-order sequence of strings, where an empty string represents
+        a null node.
+    """
+    global _is_higher
+    global _root
+    global _free
+    _is_higher = is_higher
+    _free = _NULL
+    _keys.clear()
+    for a in (_child, _sibling, _parent, _size):
+        del a[:]
+    # Each stack entry is [node, has_child] for a node whose subtrees are
+    # still being read.
+    stack = []
+    while True:
+        key = next(preorder)
+        if key != '':
+            stack.append([_new_node(key), False])
+            continue
+        node = _NULL
+        while stack:
+            entry = stack[-1]
+            if not entry[1]:
+                _set_child(entry[0], node)
+                entry[1] = True
+                break
+            stack.pop()
+            _set_sibling(entry[0], node)
+            _update_size(entry[0])
+            node = entry[0]
+        else:
+            _root = node
+            return
+
+
+def to_preorder() -> Iterator[str]:
+    """Return the pre-order sequence of strings in the heap.
+
+    Each null node is represented by an empty string.
+    """
+    stack = [_root]
+    while stack:
+        node = stack.pop()
+        if node == _NULL:
+            yield ''
+            continue
+        yield _keys[node]
+        stack.append(_sibling[node])
+        stack.append(_child[node])
+
+
+def _merge_pair(x: int, y: int) -> tuple[int, bool]:
+    # Merge two heaps, discarding sibling references.
+    # Return the new root and whether node `x` is a parent of node `y`.
+    x_is_parent = _is_higher(_keys[x], _keys[y])
+    parent, child = (x, y) if x_is_parent else (y, x)
+    _set_sibling(child, _child[parent])
+    _update_size(child)
+    _set_child(parent, child)
+    _sibling[parent] = _parent[parent] = _NULL
+    _update_size(parent)
+    return parent, x_is_parent
+
+
+def insert(key: str) -> int:
+    """Insert key into heap and return its index."""
+    global _root
+    node = _new_node(key)
+    if _root != _NULL:
+        _root, is_root = _merge_pair(node, _root)
+        return 0 if is_root else 1
+    _root = node
+    return 0
+
+
+def _pair_siblings(node: int) -> int:
+    # Merge siblings pairwise from left to right.
+    merged = []
+    while node != _NULL and _sibling[node] != _NULL:
+        next_node = _sibling[_sibling[node]]
+        new_node, _ = _merge_pair(node, _sibling[node])
+        merged.append(new_node)
+        node = next_node
+    for new_node in reversed(merged):
+        _set_sibling(new_node, node)
+        _update_size(new_node)
+        node = new_node
+    return node
+
+
+def _merge_siblings(node: int) -> int:
+    # Repeatedly merge siblings pairwise into a single heap.
+    while _sibling[node] != _NULL:
+        node = _pair_siblings(node)
+    _parent[node] = _NULL
+    return node
+
+
+def insert_many(keys: list[str]):
+    """Insert keys into heap, merging them together first."""
+    global _root
+    if not keys:
+        return
+    node = _NULL
+    for key in reversed(keys):
+        new_node = _new_node(key)
+        _set_sibling(new_node, node)
+        _update_size(new_node)
+        node = new_node
+    node = _merge_siblings(node)
+    _root = _merge_pair(node, _root)[0] if _root != _NULL else node
+
+
+def _find(idx: int) -> int:
+    # Return the node with given pre-order index.
+    node = _root
+    while idx:
+        right_idx = 1 + _subtree_size(_child[node])
+        if idx < right_idx:
+            node = _child[node]
+            idx -= 1
+        else:
+            node = _sibling[node]
+            idx -= right_idx
+    return node
+
+
+def delete(idx: int) -> str:
+    """Delete node with given pre-order index and return its key."""
+    global _root
+    node = _find(idx)
+    key = _keys[node]
+    child, sibling = _child[node], _sibling[node]
+    if idx == 0:
+        _root = _merge_siblings(child) if child != _NULL else _NULL
+        _free_node(node)
+        return key
+    # Splice the child list in front of the sibling list.
+    replacement = sibling
+    if child != _NULL:
+        children = [child]
+        while _sibling[children[-1]] != _NULL:
+            children.append(_sibling[children[-1]])
+        _set_sibling(children[-1], sibling)
+        for c in reversed(children):
+            _update_size(c)
+        replacement = child
+    parent = _parent[node]
+    if _child[parent] == node:
+        _set_child(parent, replacement)
+    else:
+        _set_sibling(parent, replacement)
+    while parent != _NULL:
+        _update_size(parent)
+        parent = _parent[parent]
+    _free_node(node)
+    return key
+
+
+def move(idx: int) -> tuple[str, int]:
+    """Delete then reinsert key of node with given pre-order index.
+
+    Return key of target node and new index.
+    """
+    key = delete(idx)
+    new_idx = insert(key)
+    return key, new_idx
+
+
+def promote(idx: int) -> tuple[str, int]:
+    """Merge subtree of node with given pre-order index with the root.
+
+    Return key of target node and new index.
+    """
+    global _root
+    node = _find(idx)
+    if idx == 0:
+        return _keys[node], 0
+    parent = _parent[node]
+    if _child[parent] == node:
+        _set_child(parent, _sibling[node])
+    else:
+        _set_sibling(parent, _sibling[node])
+    while parent != _NULL:
+        _update_size(parent)
+        parent = _parent[parent]
+    _sibling[node] = _NULL
+    _update_size(node)
+    _root, is_root = _merge_pair(node, _root)
+    return _keys[node], 0 if is_root else 1
+
+
+def rename(idx: int, name: str) -> str:
+    """Rename item with given pre-order index and return its previous key."""
+    node = _find(idx)
+    key, _keys[node] = _keys[node], name
+    return key
+
+
+def key_at(idx: int) -> str:
+    """Return key of item with given pre-order index."""
+    return _keys[_find(idx)]
+
+
+def is_empty() -> bool:
+    """Check if heap is empty."""
+    return _root == _NULL
+
+
+def is_valid_idx(idx: int) -> bool:
+    """Check if number is a valid pre-order index."""
+    if is_empty():
+        return False
+    return idx >= 0 and idx < _size[_root]
+
+
+def size() -> int:
+    """Return the number of items in the heap."""
+    return _subtree_size(_root)
+
+
+def display(start: int = 0, count: Optional[int] = None) -> Iterator[str]:
+    """Return the strings used to visually display the heap.
+
+    Optionally display only `count` rows starting at pre-order index
+    `start`, skipping the rows before it by subtree size.
+    """
+    if start >= size():
+        return iter([])
+    num_digits = len(str(_size[_root] - 1))
+    end = _size[_root] if count is None else min(start + count, _size[_root])
+    def do_display() -> Iterator[str]:
+        # Walk down to the first row, keeping the siblings still to be
+        # displayed and the prefix of each.
+        stack = []
+        node, prefix = _root, ''
+        idx = start
+        while idx:
+            right_idx = 1 + _subtree_size(_child[node])
+            if idx < right_idx:
+                has_sibling = _sibling[node] != _NULL
+                if has_sibling:
+                    stack.append((_sibling[node], prefix))
+                prefix += '║' if has_sibling else ' '
+                node = _child[node]
+                idx -= 1
+            else:
+                node = _sibling[node]
+                idx -= right_idx
+        stack.append((node, prefix))
+        for idx in range(start, end):
+            node, prefix = stack.pop()
+            idx_str = f"{idx:>{num_digits}}"
+            child, sibling = _child[node], _sibling[node]
+            c2 = '╦' if child != _NULL else '═'
+            if sibling != _NULL:
+                c1 = '╠'
+                c0 = '║'
+                stack.append((sibling, prefix))
+            else:
+                c1 = '╚'
+                c0 = ' '
+            if child != _NULL:
+                stack.append((child, prefix + c0))
+            yield idx_str + prefix + c1 + c2 + _keys[node]
+    return do_display()
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""Benchmark script for the heap implementations and the window.
+
+Comparisons are answered by an oracle that orders keys by a hidden numeric
+priority, so no user input is needed.  With `--noise P`, each answer is
+wrong with probability P, as a person's might be.
+
+Usage
+-----
+./bench.py [stores|engines|suite|render|scale] [-n N] [--noise P]
+           [--save FILE] [--compare FILE]
+
+stores (default)
+    Report, for the `heap` (path-copying nodes) and `arrayheap` (parallel
+    arrays) modules, the memory used per node and the operations per second
+    of insert, delete and move.
+engines
+    Report, for each engine of the `heap` module, the comparisons and
+    microseconds per operation of insert, delete, move and promote.
+suite
+    Run workloads of every `heap` operation at sizes 10^2 up to N, and
+    report operations per second, comparisons per operation, peak memory
+    and net allocated blocks of each.  `--save` writes the results as a
+    JSON baseline, and `--compare` reports results that regressed against
+    one, exiting with status 1 if any did.
+render
+    Draw the window in a pseudo-terminal with a heap of N items, and report
+    the frames per second and bytes written to the terminal per frame while
+    typing a prompt and while moving the highlighted row.
+scale
+    Build a heap of N items (default 10^6) twice, once with every item in
+    the root's child list and once as a chain of first children, then save,
+    load, display, rename and delete in each, reporting the seconds taken.
+    Exits with status 1 if any step raises `RecursionError` or leaves the
+    heap wrong.
+"""
+
+import argparse
+import gc
+import json
+import os
+import pty
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import ModuleType
+from typing import Callable
+
+import heap
+import heapfile
+import arrayheap
+
+STORES = {'node': heap, 'array': arrayheap}
+
+# Relative and absolute change in a suite result counted as a regression
+TOLERANCE = {'ops_per_sec': (-0.2, 0), 'comparisons_per_op': (0.01, 0),
+             'peak_bytes': (0.2, 4096), 'blocks': (0.2, 100)}
+
+# Type Aliases
+Workload = tuple[str, int, Callable[[int], None]]
+
+# Global Variables
+_comparisons = 0
+_noise = 0.0
+_noise_rnd = random.Random(0)
+
+
+def _priority(key: str) -> int:
+    # Return the hidden priority encoded in a benchmark key.
+    return int(key.split('-')[0])
+
+
+def _is_higher(key1: str, key2: str) -> bool:
+    # Oracle ordering keys by hidden priority, answering wrongly with
+    # probability `_noise`.
+    global _comparisons
+    _comparisons += 1
+    answer = _priority(key1) > _priority(key2)
+    if _noise and _noise_rnd.random() < _noise:
+        return not answer
+    return answer
+
+
+def _make_keys(n: int, seed: int = 0) -> list[str]:
+    # Return n unique keys with shuffled hidden priorities.
+    priorities = list(range(n))
+    random.Random(seed).shuffle(priorities)
+    return [f"{p}-item" for p in priorities]
+
+
+def _build(store: ModuleType, keys: list[str]):
+    # Initialize a store with keys inserted in order.
+    store.init(_is_higher, iter(['']))
+    for key in keys:
+        store.insert(key)
+
+
+def memory_per_node(store: ModuleType, n: int) -> float:
+    """Return the bytes allocated per node when loading n nodes.
+
+    The key strings themselves are excluded.
+    """
+    _build(store, _make_keys(n))
+    preorder = list(store.to_preorder())
+    store.init(_is_higher, iter(['']))
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store.init(_is_higher, iter(preorder))
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / n
+
+
+def ops_per_sec(store: ModuleType, n: int) -> dict[str, float]:
+    """Return operations per second of each operation on a heap of size n."""
+    keys = _make_keys(n)
+    rates = {}
+    start = time.perf_counter()
+    _build(store, keys)
+    rates['insert'] = n / (time.perf_counter() - start)
+    rnd = random.Random(1)
+    n_ops = max(1, min(n // 10, 500))
+    for name in ('move', 'delete', 'delete root'):
+        start = time.perf_counter()
+        for _ in range(n_ops):
+            if name == 'move':
+                store.move(rnd.randrange(n))
+            else:
+                store.delete(rnd.randrange(n) if name == 'delete' else 0)
+                n -= 1
+        rates[name] = n_ops / (time.perf_counter() - start)
+    return rates
+
+
+def engine_costs(engine: str, n: int) -> dict[str, tuple[float, float]]:
+    """Return comparisons and microseconds per operation of an engine.
+
+    Operations are measured on a heap of size n built by inserting keys one
+    at a time.
+    """
+    global _comparisons
+    keys = _make_keys(n)
+    heap.init(_is_higher, iter(['']), engine=engine)
+    rnd = random.Random(1)
+    n_ops = max(1, min(n // 10, 500))
+    costs = {}
+    for name in ('insert', 'move', 'promote', 'delete', 'delete root'):
+        _comparisons = 0
+        count = n if name == 'insert' else n_ops
+        start = time.perf_counter()
+        for i in range(count):
+            if name == 'insert':
+                heap.insert(keys[i])
+            elif name in ('move', 'promote'):
+                getattr(heap, name)(rnd.randrange(n))
+            else:
+                heap.delete(rnd.randrange(n) if name == 'delete' else 0)
+                n -= 1
+        elapsed = time.perf_counter() - start
+        costs[name] = _comparisons / count, elapsed / count * 10**6
+    return costs
+
+
+def _workloads(n: int, path: str) -> list[Workload]:
+    # Return the workloads run in order on one heap of size n, each as
+    # (name, number of operations, function given the operation number).
+    keys = _make_keys(n)
+    rnd = random.Random(1)
+    n_ops = max(1, min(n // 10, 200))
+    def rename(i: int):
+        idx = rnd.randrange(heap.size())
+        heap.rename(idx, f"{_priority(heap.key_at(idx))}-renamed")
+    return [
+        ('insert', n, lambda i: heap.insert(keys[i])),
+        ('delete root', 1, lambda i: heap.delete(0)),
+        ('delete', n_ops, lambda i: heap.delete(rnd.randrange(heap.size()))),
+        ('move', n_ops, lambda i: heap.move(rnd.randrange(heap.size()))),
+        ('rename', n_ops, rename),
+        ('display', n_ops,
+         lambda i: list(heap.display(rnd.randrange(heap.size()), 40))),
+        ('to_preorder', 1, lambda i: list(heap.to_preorder())),
+        ('save', 1, lambda i: heapfile.save(path, heap.to_preorder())),
+        ('load', 1, lambda i: (heap.load(heapfile.HeapFile(path)),
+                               list(heap.display(0, 40)))),
+    ]
+
+
+def _run_workloads(n: int, measure_memory: bool) -> dict[str, dict]:
+    # Run the workloads on a heap of size n, measuring time and comparisons
+    # or memory.  Garbage collection is paused while measuring, as in
+    # `timeit`, so its pauses don't depend on the allocations before.
+    global _comparisons
+    global _noise_rnd
+    _noise_rnd = random.Random(0)
+    heap.init(_is_higher, iter(['']))
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'heap' + heapfile.BINARY_EXTENSION)
+        for name, count, run in _workloads(n, path):
+            if measure_memory:
+                tracemalloc.start()
+                blocks = sys.getallocatedblocks()
+            _comparisons = 0
+            gc.disable()
+            start = time.perf_counter()
+            for i in range(count):
+                run(i)
+            elapsed = time.perf_counter() - start
+            gc.enable()
+            if measure_memory:
+                results[name] = {
+                    'peak_bytes': tracemalloc.get_traced_memory()[1],
+                    'blocks': sys.getallocatedblocks() - blocks
+                }
+                tracemalloc.stop()
+            else:
+                results[name] = {
+                    'ops_per_sec': count / elapsed,
+                    'comparisons_per_op': _comparisons / count
+                }
+    return results
+
+
+def suite(max_n: int) -> dict[str, dict[str, dict]]:
+    """Return the results of the workloads at sizes 10^2 up to `max_n`.
+
+    Results are keyed by size, then workload, then metric.  Time is measured
+    in a separate run from memory, as tracing allocations slows it down.
+    """
+    results = {}
+    n = 100
+    while n <= max_n:
+        timed = _run_workloads(n, False)
+        traced = _run_workloads(n, True)
+        results[str(n)] = {name: timed[name] | traced[name]
+                           for name in timed}
+        n *= 10
+    return results
+
+
+def regressions(results: dict, baseline: dict) -> list[str]:
+    """Return descriptions of the results that regressed from a baseline.
+
+    A metric regresses when both its relative and absolute change pass its
+    `TOLERANCE`.
+    """
+    found = []
+    for n, workloads in results.items():
+        for name, metrics in workloads.items():
+            old_metrics = baseline.get(n, {}).get(name, {})
+            for metric, value in metrics.items():
+                old = old_metrics.get(metric)
+                if not old:
+                    continue
+                change = (value - old) / old
+                relative, absolute = TOLERANCE[metric]
+                if (change * relative > 0 and abs(change) > abs(relative)
+                        and abs(value - old) > absolute):
+                    found.append(f"n={n} {name} {metric}: "
+                                 f"{old:,.2f} -> {value:,.2f} "
+                                 f"({change:+.0%})")
+    return found
+
+
+def _check(condition: bool, step: str):
+    # Raise AssertionError naming a step that left the heap wrong.
+    if not condition:
+        raise AssertionError(f"wrong heap after {step}")
+
+
+def scale(n: int) -> dict[str, float]:
+    """Return the seconds taken by each step on heaps of size n.
+
+    Inserting keys from highest to lowest priority leaves every item in the
+    root's child list (wide), and from lowest to highest builds a chain of
+    first children (deep).  Each is then saved and loaded in both formats,
+    displayed, renamed in the middle, and deleted from in the middle and at
+    the root.  Only the top rows of the deep heap are displayed, as a row's
+    prefix is as long as its depth.
+
+    Raises `RecursionError` if a step recurses along the tree, and
+    `AssertionError` if a step leaves the heap wrong.
+    """
+    keys = sorted(_make_keys(n), key=_priority, reverse=True)
+    times = {}
+    def timed(name: str, run: Callable[[], None]):
+        # Run a step, recording its time.
+        start = time.perf_counter()
+        run()
+        times[name] = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as directory:
+        text_path = os.path.join(directory, 'heap')
+        binary_path = text_path + heapfile.BINARY_EXTENSION
+        for shape, order in (('wide', keys), ('deep', keys[::-1])):
+            heap.init(_is_higher, iter(['']))
+            timed(f"{shape} insert", lambda: [heap.insert(k) for k in order])
+            _check(heap.size() == n and heap.key_at(0) == keys[0], 'insert')
+            preorder = []
+            timed(f"{shape} to_preorder",
+                  lambda: preorder.extend(heap.to_preorder()))
+            timed(f"{shape} save text",
+                  lambda: heapfile.save(text_path, iter(preorder)))
+            timed(f"{shape} save binary",
+                  lambda: heapfile.save(binary_path, iter(preorder)))
+            def load_text():
+                # Build the heap from the text file.
+                with open(text_path, 'r') as f:
+                    heap.init(_is_higher, (s[:-1] for s in f))
+            timed(f"{shape} load text", load_text)
+            _check(list(heap.to_preorder()) == preorder, 'load text')
+            timed(f"{shape} load binary",
+                  lambda: heap.load(heapfile.HeapFile(binary_path)))
+            _check(list(heap.to_preorder()) == preorder, 'load binary')
+            last = n - 40 if shape == 'wide' else 0
+            timed(f"{shape} display",
+                  lambda: (list(heap.display(0, 40)),
+                           list(heap.display(last, 40))))
+            timed(f"{shape} rename",
+                  lambda: heap.rename(n // 2, f"{n}-renamed"))
+            _check(heap.key_at(n // 2) == f"{n}-renamed", 'rename')
+            timed(f"{shape} delete", lambda: heap.delete(n // 2))
+            timed(f"{shape} delete root", lambda: heap.delete(0))
+            _check(heap.size() == n - 2 and heap.key_at(0) == keys[1],
+                   'delete root')
+    return times
+
+
+def _draw_frames(stdscr: 'curses.window',
+                 n: int,
+                 scenario: str,
+                 n_frames: int) -> float:
+    # Draw frames of a scenario with a heap of size n.
+    # Return the frames drawn per second.
+    import curses
+    import window
+    _build(heap, _make_keys(n))
+    window.init(stdscr, heap.display, heap.size)
+    start = time.perf_counter()
+    for i in range(n_frames):
+        curses.ungetch('x')
+        if scenario == 'typing':
+            window.get_key_cursor("Insert: " + 'x' * (i % 60))
+        else:
+            window.get_key_cursor("Move index: ", i % min(n, 20))
+    return n_frames / (time.perf_counter() - start)
+
+
+def render(n: int, scenario: str, n_frames: int = 500) -> tuple[float, float]:
+    """Return frames per second and bytes written per frame of a scenario.
+
+    The window is drawn in a 40x120 pseudo-terminal.
+    """
+    read_fd, write_fd = os.pipe()
+    pid, master_fd = pty.fork()
+    if pid == 0:
+        import curses
+        os.environ.update(TERM='xterm-256color', LINES='40', COLUMNS='120')
+        rate = curses.wrapper(_draw_frames, n, scenario, n_frames)
+        os.write(write_fd, str(rate).encode())
+        os._exit(0)
+    os.close(write_fd)
+    n_bytes = 0
+    while True:
+        try:
+            data = os.read(master_fd, 1 << 16)
+        except OSError:
+            break
+        if not data:
+            break
+        n_bytes += len(data)
+    os.waitpid(pid, 0)
+    rate = float(os.read(read_fd, 64))
+    os.close(read_fd)
+    return rate, n_bytes / n_frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('benchmark', nargs='?', default='stores',
+                        choices=('stores', 'engines', 'suite', 'render',
+                                 'scale'))
+    parser.add_argument('-n', type=int,
+                        help="number of items (default: 10^6 for scale, "
+                             "otherwise 10^4)")
+    parser.add_argument('--noise', type=float, default=0.0,
+                        help="probability of a wrong answer")
+    parser.add_argument('--save', metavar='FILE',
+                        help="save suite results as a baseline")
+    parser.add_argument('--compare', metavar='FILE',
+                        help="compare suite results against a baseline")
+    args = parser.parse_args()
+    global _noise
+    _noise = args.noise
+    if args.n is None:
+        args.n = 10**6 if args.benchmark == 'scale' else 10**4
+    if args.benchmark == 'scale':
+        try:
+            times = scale(args.n)
+        except (RecursionError, AssertionError) as e:
+            print(f"failed: {type(e).__name__}: {e}")
+            sys.exit(1)
+        for name, seconds in times.items():
+            print(f"{name}: {seconds:,.2f} s")
+        return
+    if args.benchmark == 'suite':
+        results = suite(args.n)
+        for n, workloads in results.items():
+            print(f"n={n}:")
+            for name, m in workloads.items():
+                print(f"  {name}: {m['ops_per_sec']:,.1f} ops/s, "
+                      f"{m['comparisons_per_op']:,.2f} comparisons/op, "
+                      f"{m['peak_bytes']:,} peak bytes, "
+                      f"{m['blocks']:,} blocks")
+        if args.save:
+            with open(args.save, 'w') as f:
+                json.dump(results, f, indent=2)
+        if args.compare:
+            with open(args.compare, 'r') as f:
+                found = regressions(results, json.load(f))
+            for line in found:
+                print("regression: " + line)
+            if found:
+                sys.exit(1)
+        return
+    if args.benchmark == 'render':
+        for scenario in ('typing', 'navigation'):
+            rate, n_bytes = render(args.n, scenario)
+            print(f"{scenario}: {rate:,.0f} frames/s, "
+                  f"{n_bytes:,.0f} bytes/frame")
+        return
+    if args.benchmark == 'engines':
+        for engine in heap.ENGINES:
+            print(f"{engine}:")
+            costs = engine_costs(engine, args.n)
+            for op, (comparisons, usec) in costs.items():
+                print(f"  {op}: {comparisons:,.2f} comparisons/op, "
+                      f"{usec:,.1f} us/op")
+        return
+    for name, store in STORES.items():
+        print(f"{name}: {memory_per_node(store, args.n):.1f} bytes/node")
+        for op, rate in ops_per_sec(store, args.n).items():
+            print(f"  {op}: {rate:,.0f} ops/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Script to prioritize a heap file shared by `server.py`.
+
+Usage
+-----
+./client.py [--socket PATH] filename
+
+Connects to the server of a heap file, on the filename followed by
+`SOCKET_SUFFIX` by default, and shows the heap with the same commands as
+`main.py`.  Operations are applied by the server, one at a time for all
+clients, and the heap is redrawn whenever any client changes it.  While
+connected, the client is asked to answer its share of the comparisons of
+every client's operations.
+
+On quit, the server can be asked to save the file.
+"""
+
+import argparse
+import curses
+import json
+import queue
+import socket
+import threading
+from typing import Any, BinaryIO
+
+import heap
+import heapio
+import window
+from session import Operation
+from window import KEY
+from data import PROMPT, MESSAGE, SOCKET_SUFFIX
+
+# Type Aliases
+Message = dict[str, Any]
+
+# Global Variables
+_file: BinaryIO = None                  # Connection to the server
+_received: queue.Queue = queue.Queue()  # Messages read from the server
+_pending: list[Message] = []            # Messages waiting to be handled
+_last_id: int = 0
+_answering: bool = False
+
+
+def _read(f: BinaryIO):
+    # Queue the messages read from the server, then None once disconnected.
+    for line in f:
+        _received.put(json.loads(line))
+    _received.put(None)
+
+
+def _send(message: Message):
+    # Send a message to the server.
+    _file.write(json.dumps(message).encode() + b'\n')
+    _file.flush()
+
+
+def _local_compare(item1: str, item2: str) -> bool:
+    # The heap is only ordered by the server.
+    raise RuntimeError("heap mirror can't be mutated")
+
+
+def _receive(block: bool) -> bool:
+    # Handle the next message from the server, updating the heap if it is
+    # sent and keeping other messages for later.
+    # Return False if no message was waiting.
+    try:
+        message = _received.get(block)
+    except queue.Empty:
+        return False
+    if message is None:
+        raise ConnectionError("server disconnected")
+    if message.get('type') == 'heap':
+        heap.init(_local_compare, iter(message['preorder']))
+    else:
+        _pending.append(message)
+    return True
+
+
+def _answer_pending():
+    # Ask the user for the answers to the comparisons sent by the server.
+    global _answering
+    for message in [m for m in _pending if m.get('type') == 'compare']:
+        _pending.remove(message)
+        pairs = [tuple(pair) for pair in message['pairs']]
+        _answering = True
+        try:
+            answers = heapio.answer(pairs)
+        finally:
+            _answering = False
+        _send({'op': 'answer', 'qid': message['qid'], 'answers': answers})
+
+
+def _poll():
+    # Handle the messages received while waiting for a key.
+    while _receive(False):
+        pass
+    if not _answering:
+        _answer_pending()
+
+
+def _request(request: Message) -> Message:
+    # Send a request and return the reply, answering comparisons meanwhile.
+    global _last_id
+    _last_id += 1
+    _send(dict(request, id=_last_id))
+    while True:
+        for message in _pending:
+            if message.get('id') == _last_id:
+                _pending.remove(message)
+                return message
+        _answer_pending()
+        _receive(True)
+
+
+def _run(op: Operation) -> tuple[str, int]:
+    # Apply an operation through the server.
+    # Return tuple: (result message, item index).
+    request = dict(op)
+    if 'idx' in op:
+        request['expect'] = heap.key_at(op['idx'])
+    reply = _request(request)
+    if reply['type'] == 'error':
+        return MESSAGE['SERVER_ERROR'] + reply['error'], -1
+    return reply['message'], reply['idx']
+
+
+def _query_save() -> tuple[bool, str]:
+    # Query if the user wants the server to save the file.
+    # Return tuple: (completion indicator, result message).
+    while True:
+        key = window.get_key(PROMPT['SAVE'])
+        if key == 'y':
+            message, _ = _run({'op': 'save'})
+            window.get_key(msg=message)
+            return True, ''
+        elif key == 'n':
+            window.get_key(msg=MESSAGE['NOT_SAVED'])
+            return True, ''
+        elif key == KEY['ESCAPE']:
+            return False, MESSAGE['CANCELED']
+
+
+def main(curses_window: curses.window, socket_path: str):
+    global _file
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(socket_path)
+    _file = connection.makefile('rwb')
+    threading.Thread(target=_read, args=(_file,), daemon=True).start()
+    _receive(True)
+    heapio.init_client(curses_window, _run)
+    window.set_idle(_poll)
+    message = MESSAGE['CONNECTED'] + socket_path
+    idx = -1
+    dispatch = {'i': heapio.insert,
+                'b': heapio.bulk,
+                'd': lambda: heapio.delete() + (-1,),
+                'm': heapio.move,
+                'p': heapio.promote,
+                'r': heapio.rename,
+                'u': heapio.undo,
+                'U': heapio.redo,
+                '/': heapio.search}
+    while True:
+        cmd = heapio.get_cmd(message, idx)
+        if cmd == 'q':
+            done, message = _query_save()
+            if done:
+                return
+            idx = -1
+        elif cmd == 's':
+            heapio.toggle_stats()
+            idx = -1
+        elif cmd in dispatch:
+            _, message, idx = dispatch[cmd]()
+        else:
+            message = ''
+            idx = -1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('filename')
+    parser.add_argument('--socket', metavar='PATH',
+                        help="socket of the server (default: filename"
+                             f" + {SOCKET_SUFFIX!r})")
+    args = parser.parse_args()
+    curses.wrapper(main, args.socket or args.filename + SOCKET_SUFFIX)
@@ -17,13 +17,14 @@ COLOR : dict[str, int]
 """
 
 import curses
-try:
-    import tomllib
-except ModuleNotFoundError:
-    import tomli as tomllib
+import marshal
+import os
 from typing import Iterator
 
-from data import DEFAULT_CONFIG_FILE, NO_COLORS_ERROR
+from data import DEFAULT_CONFIG_FILE, CONFIG_CACHE_FILE, NO_COLORS_ERROR
+
+# Type Aliases
+RGB = tuple[int, int, int]
 
 COLOR = {
     'PROMPT': 0,
@@ -55,24 +56,53 @@ def _make_pair(foreground: int, background: int) -> int:
     return curses.color_pair(i)
 
 
-def _hex_to_1000(hex_color: str) -> tuple[int, int, int]:
+def _hex_to_1000(hex_color: str) -> RGB:
     # Convert 24-bit color hex string to RGB values in range [0, 1000].
     def do_convert(component: str) -> int:
         return round(int(component, 16) * 1000 / 255)
     return tuple(do_convert(hex_color[i:i+2]) for i in (0, 2, 4))
 
 
-def _parse_config():
-    # Parse config file to initialize individual colors.
+def _parse_config() -> dict[str, RGB]:
+    # Parse config file for the color of each feature.
+    try:
+        import tomllib
+    except ModuleNotFoundError:
+        import tomli as tomllib
     with open(DEFAULT_CONFIG_FILE, "rb") as f:
         config = tomllib.load(f)
     color_scheme = config['color_schemes'][config['color_scheme']]
     color_hex_codes = config['colors']
+    colors = {}
     for feature in _color_IDs.keys():
         color_name = color_scheme[feature]
         color_hex = color_hex_codes[color_name]
-        r, g, b = _hex_to_1000(color_hex)
-        curses.init_color(_color_IDs[feature], r, g, b)
+        colors[feature] = _hex_to_1000(color_hex)
+    return colors
+
+
+def _load_config() -> dict[str, RGB]:
+    # Return the color of each feature, from the cache unless the config
+    # file changed since it was cached, so that it is parsed only once.
+    # The cache is a marshalled (modification time, size, colors) tuple.
+    stat = os.stat(DEFAULT_CONFIG_FILE)
+    try:
+        with open(CONFIG_CACHE_FILE, "rb") as f:
+            mtime, size, colors = marshal.load(f)
+        if (mtime, size) == (stat.st_mtime_ns, stat.st_size):
+            return colors
+    except (OSError, EOFError, ValueError, TypeError):
+        pass    # Missing or unreadable, so parsed again
+    colors = _parse_config()
+    temp_file = f"{CONFIG_CACHE_FILE}.{os.getpid()}"
+    try:
+        os.makedirs(os.path.dirname(CONFIG_CACHE_FILE), exist_ok=True)
+        with open(temp_file, "wb") as f:
+            marshal.dump((stat.st_mtime_ns, stat.st_size, colors), f)
+        os.replace(temp_file, CONFIG_CACHE_FILE)
+    except OSError:
+        pass    # Not cached if the directory is read-only
+    return colors
 
 
 def init_colors():
@@ -83,7 +113,8 @@ def init_colors():
     if not curses.can_change_color():
         curses.use_default_colors()
         return
-    _parse_config()
+    for feature, (r, g, b) in _load_config().items():
+        curses.init_color(_color_IDs[feature], r, g, b)
     COLOR['PROMPT'] = _make_pair(_color_IDs['prompt'], _color_IDs['prompt_bg'])
     COLOR['TEXT'] = _make_pair(_color_IDs['text'], _color_IDs['text_bg'])
 
@@ -2,48 +2,88 @@
 
 from typing import List
 import os
-import curses
 
 _script_dir = os.path.dirname(os.path.abspath(__file__))
 DEFAULT_CONFIG_FILE = os.path.join(_script_dir, "config.default.toml")
+CONFIG_CACHE_FILE = os.path.join(_script_dir, "__pycache__",
+                                 "config.default.cache")
+
+ORACLE_SUFFIX = ".answers"    # Appended to a heap filename
+BINARY_EXTENSION = ".pmh"     # Heap files saved in the binary format
+JOURNAL_SUFFIX = ".journal"   # Appended to a heap filename
+SOCKET_SUFFIX = ".sock"       # Appended to a heap filename
+PROGRESS_SUFFIX = ".progress" # Appended to an export filename
+CSV_EXTENSION = ".csv"        # Exports written as CSV
+JOURNAL_LIMIT = 1000          # Journal entries before the heap is saved
+
+PANEL_COLS = 32               # Width of the side panel
+TOP_K = 10                    # Items ranked in the top items panel
+OFFER_DELAY = 500             # Milliseconds idle before comparing ahead
+WAIT_DELAY = 10               # Milliseconds between checks while loading
 
 NO_COLORS_ERROR = "Terminal does not support colors."
 
 PROMPT = {
     'SELECT': "Select higher priority.",
+    'SELECT_BATCH': "Select higher priority in each row, then press Enter.",
     'INSERT': "Insert: ",
+    'IMPORT': "Import items from file: ",
     'DELETE': "Delete index: ",
     'MOVE': "Move index: ",
+    'PROMOTE': "Promote index: ",
     'RENAME_INDEX': "Rename index: ",
     'RENAME_NAME': "New name: ",
+    'SEARCH': "Search: ",
+    'EXPORT': "Export ranking to file: ",
+    'SWITCH': "Switch to heap file, then press Enter.",
     'FILENAME': "Enter filename: ",
     'SAVE': "Save? (y/n)"
 }
 
 MESSAGE = {
     'OPENED': "Opened: ",
+    'OPENING': "Opening: ",
+    'SWITCHED': "Switched to: ",
     'LABEL_1': "(1) ",
     'LABEL_2': "(2) ",
+    'MARK': "*",
     'EMPTY_HEAP': "Heap is empty.",
     'CANCELED': "Canceled.",
     'INSERTED': "Inserted: ",
+    'IMPORTED': "Items imported: ",
+    'COMPARISONS': "comparisons: ",
+    'SEQUENTIAL': "one at a time: ",
     'DELETED': "Deleted: " ,
     'MOVED': "Moved: ",
+    'PROMOTED': "Promoted: ",
     'RENAMED': "Renamed: ",
     'SAVED': "Saved: ",
     'FILE_EXISTS': "File already exists: ",
     'INVALID_PATH': "Invalid path: ",
-    'NOT_SAVED': "Not saved."
-}
-
-KEY = {
-    'ESCAPE': chr(27),
-    'BACKSPACE': chr(curses.KEY_BACKSPACE),
-    'ENTER_KEYS': (chr(curses.KEY_ENTER), '\n', '\r')
+    'NOT_HEAP': "Not a heap file: ",
+    'NOT_SAVED': "Not saved.",
+    'AVOIDED': "prompts avoided: ",
+    'REPLAYED': "operations replayed: ",
+    'CONNECTED': "Connected: ",
+    'SERVER_ERROR': "Server error: ",
+    'UNDONE': "Undone: ",
+    'REDONE': "Redone: ",
+    'NO_UNDO': "Nothing to undo.",
+    'NO_REDO': "Nothing to redo.",
+    'MATCH': "Match ",
+    'NO_MATCHES': "No matches.",
+    'FOUND': "Found: ",
+    'TOP': "Top ",
+    'UNRANKED': "(T to rank)",
+    'RANKED': "Items ranked: ",
+    'EXPORTED': "Exported: ",
+    'PAUSED': "Export paused, answers kept in: ",
+    'OFFER': "Answer ahead: "
 }
 
 _SPACING = ' ' * 4
-_COMMAND_LIST = ["insert", "delete", "move", "rename", "quit"]
+_COMMAND_LIST = ["insert", "bulk", "delete", "move", "promote", "rename",
+                 "undo", "export", "quit"]
 
 
 def _get_underline_cols() -> List[int]:
@@ -65,6 +105,7 @@ ROW = {
     'PROMPT': 0,
     'PRE_MSG': 1,
     'MSG': 2,
+    'STATUS': 3,
     'HEAP': 4
 }
 
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Script to apply commands to a heap file without the text interface.
+
+Usage
+-----
+./headless.py [--ranking FILE] [--answers FILE] [--engine ENGINE]
+              [--journal] filename [script]
+
+Opens the heap file, or starts an empty heap if it doesn't exist, and
+applies the commands in `script`, or standard input if not given, one per
+line:
+
+    insert NAME
+    bulk FILE
+    delete INDEX
+    move INDEX
+    promote INDEX
+    rename INDEX NAME
+    undo
+    redo
+    export FILE
+    save [FILENAME]
+
+Blank lines and lines starting with '#' are skipped.  The result of each
+command is printed as a JSON object on one line, such as
+
+    {"op": "insert", "key": "a", "message": "Inserted: a", "new_idx": 0}
+
+where `new_idx` is the item's index after the command, if it remains.
+`export` writes the items ranked highest first (see `session.export`); if
+it stops at a comparison that can't be answered, running it again resumes
+from its progress file.
+
+The heap is only saved by the `save` command, or on exit if journaling
+and no command failed.  A failed command may have been partly applied, so
+the heap is left as last saved.
+
+Comparisons are answered from the answers saved with the heap, then from
+a ranking (a file listing items one per line, highest priority first), then
+from an answers file (lines of "higher<TAB>lower", as saved next to heap
+files), inferring answers by transitivity.  Answers from the ranking and
+answers file are not added to the answers saved with the heap.  A
+comparison that can't be answered, or an invalid command, prints an object
+with an "error" field and stops the script with exit status 1.
+"""
+
+import argparse
+import json
+import sys
+from typing import Optional, TextIO
+
+import heap
+import session
+from oracle import Oracle
+from data import MESSAGE
+
+# Global Variables
+_filename: str = ''
+_ranks: dict[str, int] = {}     # Position of each item in the ranking
+_answers: Optional[Oracle] = None
+
+
+class UnknownComparison(LookupError):
+    """Raised when a comparison can't be answered without a person."""
+
+
+def _is_higher(item1: str, item2: str) -> bool:
+    # Return True if item 1 is of higher priority than item 2, according to
+    # the ranking or the answers file.
+    if item1 in _ranks and item2 in _ranks:
+        return _ranks[item1] < _ranks[item2]
+    known = _answers.lookup(item1, item2) if _answers else None
+    if known is None:
+        raise UnknownComparison(f"{item1!r} vs {item2!r}")
+    return known
+
+
+def _parse_idx(arg: str) -> int:
+    # Return a valid index from a command argument.
+    if not arg.isdigit() or not heap.is_valid_idx(int(arg)):
+        raise ValueError(f"invalid index: {arg!r}")
+    return int(arg)
+
+
+def _run_line(line: str) -> dict:
+    # Apply a command line and return its result.
+    cmd, _, arg = line.partition(' ')
+    arg = arg.strip()
+    if cmd == 'export' and arg:
+        return {'op': 'export', 'filename': arg,
+                'message': session.export(arg, _is_higher)}
+    if cmd == 'save':
+        filename = arg or _filename
+        session.save(filename)
+        return {'op': 'save', 'filename': filename,
+                'message': MESSAGE['SAVED'] + filename}
+    if cmd == 'insert' and arg:
+        op = {'op': 'insert', 'key': arg}
+    elif cmd == 'bulk' and arg:
+        with open(arg, 'r') as f:
+            op = {'op': 'insert_many', 'keys': session.read_items(f)}
+    elif cmd in ('undo', 'redo') and not arg:
+        op = {'op': cmd}
+    elif cmd in ('delete', 'move', 'promote'):
+        op = {'op': cmd, 'idx': _parse_idx(arg)}
+    elif cmd == 'rename':
+        idx, _, name = arg.partition(' ')
+        if not name.strip():
+            raise ValueError("missing name")
+        op = {'op': 'rename', 'idx': _parse_idx(idx), 'name': name.strip()}
+    else:
+        raise ValueError(f"invalid command: {line!r}")
+    message, idx = session.run(op)
+    result = dict(op, message=message)
+    result.pop('keys', None)
+    if idx != -1:
+        result['new_idx'] = idx
+    return result
+
+
+def run_script(script: TextIO, out: TextIO) -> bool:
+    """Apply the commands in a script, writing results as JSON lines.
+
+    Return False if a command failed, stopping the script.
+    """
+    for line_number, line in enumerate(script, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            result = _run_line(line)
+        except (UnknownComparison, ValueError, OSError) as e:
+            out.write(json.dumps({'error': f"{type(e).__name__}: {e}",
+                                  'line': line_number}) + '\n')
+            return False
+        out.write(json.dumps(result) + '\n')
+    return True
+
+
+def main():
+    global _filename
+    global _answers
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('filename')
+    parser.add_argument('script', nargs='?')
+    parser.add_argument('--ranking', metavar='FILE',
+                        help="items one per line, highest priority first")
+    parser.add_argument('--answers', metavar='FILE',
+                        help="comparison answers as higher<TAB>lower lines")
+    parser.add_argument('--engine', choices=heap.ENGINES,
+                        default=heap.ENGINES[0])
+    parser.add_argument('--journal', action='store_true',
+                        help="journal operations and save the file on exit")
+    args = parser.parse_args()
+    _filename = args.filename
+    if args.ranking:
+        with open(args.ranking, 'r') as f:
+            items = session.read_items(f)
+        _ranks.update((item, i) for i, item in enumerate(items))
+    if args.answers:
+        _answers = Oracle(_is_higher)
+        _answers.load(args.answers)
+    session.init(args.filename, _is_higher, journal=args.journal,
+                 engine=args.engine, remember=False)
+    if args.script:
+        with open(args.script, 'r') as f:
+            done = run_script(f, sys.stdout)
+    else:
+        done = run_script(sys.stdin, sys.stdout)
+    if not done:
+        sys.exit(1)
+    session.close()
+
+
+if __name__ == '__main__':
+    main()
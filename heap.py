@@ -2,39 +2,174 @@
 
 Functions
 ---------
-init(is_higher: CompareStr, preorder: Iterator[str] = iter(['']))
+init(is_higher: CompareStr, preorder: Iterator[str] = iter(['']),
+     compare_batch: Optional[CompareBatch] = None, engine: str = 'multipass')
     Initialize the heap.
+set_engine(engine: str)
+    Select the strategy used to order the heap.
 to_preorder() -> Iterator[str]
     Return the pre-order sequence of strings in the heap.
+snapshot() -> Snapshot
+    Return the current heap, unaffected by later mutations.
+snapshot_preorder(heap: Snapshot) -> Iterator[str]
+    Return the pre-order sequence of strings in a snapshot.
+build_snapshot(preorder: Iterator[str]) -> Snapshot
+    Return a snapshot of the heap with a given pre-order sequence.
+restore(heap: Snapshot)
+    Replace the heap with a snapshot.
+edges() -> Iterator[tuple[str, str]]
+    Return the (parent, child) pairs of keys in the heap.
+nodes_built() -> int
+    Return the number of nodes built so far.
+swap(state: Optional[HeapState]) -> HeapState
+    Replace the heap and its caches with a saved state.
+memory_bytes() -> int
+    Return an estimate of the memory used by the heap.
 insert(key: str) -> int:
     Insert key into heap and return its index.
+insert_many(keys: list[str])
+    Insert keys into heap, merging them together first.
 delete(idx: int) -> str
     Delete node with given pre-order index and return its key.
 move(idx: int) -> tuple[str, int]:
     Delete then reinsert key of node with given pre-order index.
-rename(idx: int, name: str)
-    Rename item with given pre-order index.
+promote(idx: int) -> tuple[str, int]
+    Merge subtree of node with given pre-order index with the root.
+rename(idx: int, name: str) -> str
+    Rename item with given pre-order index and return its previous key.
+key_at(idx: int) -> str
+    Return key of item with given pre-order index.
+load(heap_file: HeapFile)
+    Replace the heap with the nodes of a binary heap file.
 is_empty() -> bool
     Check if heap is empty.
 is_valid_idx(idx: int) -> bool
     Check if number is a valid pre-order index.
-display() -> Iterator[str]
+size() -> int
+    Return the number of items in the heap.
+display(start: int = 0, count: Optional[int] = None) -> Iterator[str]
     Return the strings used to visually display the heap.
+find(query: str) -> list[int]
+    Return the indices of the items matching a search query.
+top_k(k: int, compare_batch: Optional[CompareBatch] = None) -> list[str]
+    Return the keys of the `k` highest priority items, highest first.
+
+Classes
+-------
+HeapState
+    A heap and everything cached from it.
 
 Notes
 -----
-Implements a pairing heap as a child-sibling binary tree.
+Implements a pairing heap as a child-sibling binary tree.  Traversals use
+explicit stacks and loops, since a long sibling list makes the tree as deep
+as the heap is large.
+
+Nodes are never modified once built: mutations copy the path to the nodes
+they change.  A root is therefore a snapshot of the heap, which can be
+read, even from another thread, while the heap is mutated, or restored
+later.  Snapshots share their unchanged nodes, so keeping one costs about
+`NODE_BYTES` for each node built since.
+
+The engine selects how comparisons are spent (see `ENGINES`):
+
+multipass
+    Deleting the root merges its children pairwise in repeated passes
+    until one is left.
+twopass
+    Deleting the root merges its children pairwise once, then merges the
+    results from right to left.
+sorted
+    Inserting compares the key along the path of first children by binary
+    search and links it in place.  Starting from an empty heap, the heap
+    is then a sorted list, and deletions need no comparisons.  Other
+    heaps are still ordered correctly, merging as `multipass` does.
+rankpairing
+    Deleting the root merges its children as a multi-pass rank-pairing
+    heap deletes its minimum: heaps of equal rank are linked in passes
+    until all ranks differ, then the highest of the heaps left is found
+    by a tournament, and the others become its children, as the roots of
+    a rank-pairing heap are kept in a list beside the minimum.
+
+All engines keep the same tree, so files are shared between them.  The
+child-sibling tree of a node is the half-ordered binary tree of a
+rank-pairing heap, its first child being the left child and its next
+sibling the right child.  Ranks follow the type-1 rank rule from the
+leaves up, so they are not stored but computed when the `rankpairing`
+engine first needs them, and cached on the nodes, which never change.
+The ranks of a binary heap file are computed once from its arrays.
+
+Each pass merging a sibling list pairwise is a generator that yields the
+list of key pairs it needs compared and resumes with the answers, so the
+independent comparisons of a pass can be answered together.
+
+Nodes are looked up by pre-order index by walking down from the root by
+subtree size, which takes time in proportion to the length of the path in
+the child-sibling tree, without visiting the subtrees skipped.  Mutations
+copy the path they walked.
+
+Displayed rows are cached.  A version counter changes with every mutation
+once its comparisons are answered, as the heap is displayed unchanged while
+they are asked, and the rows of the last display call are returned again
+until it does.
+The text of each row after its index column is cached by index, and a
+mutation discards only the rows of the subtree it changed, shifting the
+indices of the rows after it.  Index column strings are cached until the
+number of digits changes.
+
+A heap loaded from a binary heap file materializes each node's key and
+children on first access, so memory grows with the part of the heap that
+has been traversed.  Until the heap is mutated, nodes are looked up by
+index directly in the file, whose nodes are numbered in pre-order.  The
+pre-order sequence of the heap, as written when saving, reads the subtrees
+still unchanged from the file without loading their nodes.
+
+Items are found by a `KeyIndex` of the keys, along with the nodes with
+each key and the parent of each node in the child-sibling tree, so that the
+index of a node is found by walking up to the root.  They are built on the
+first search, which loads every node of a binary heap file, and each later
+search updates them by comparing the heap with the one last searched:
+nodes are never modified, so only the nodes added and removed since are
+visited.
+
+The heap and everything cached from it make up a `HeapState`, which
+`swap` exchanges with a saved one, so that several heaps can be kept
+loaded and switched between.  The callbacks and engine are shared between
+them.  Nodes loaded from a binary file read the file of the state they
+were loaded into, so a heap's snapshots can be read after it is swapped
+out.
+
+When `stats.enabled` is set, comparisons, nodes allocated, steps taken to
+find nodes by index and rows rendered are counted.
 """
 
-from typing import Callable, Optional, Iterator
+import sys
+from typing import (Callable, Optional, Iterator, Generator,
+                    TYPE_CHECKING)
+
+import stats
+
+if TYPE_CHECKING:
+    from heapfile import HeapFile
+    from keyindex import KeyIndex
 
 # Type Aliases
 CompareStr =  Callable[[str, str], bool]
+CompareBatch = Callable[[list[tuple[str, str]]], list[bool]]
 MaybeNode = Optional['_Node']
+MergeSteps = Generator[list[tuple[str, str]], list[bool], MaybeNode]
+Snapshot = MaybeNode
+
+ENGINES = ('multipass', 'twopass', 'sorted', 'rankpairing')
 
 # Global Variables
+_engine: str = 'multipass'
 _is_higher: CompareStr = None
-_root: '_Node' = None
+_compare_batch: CompareBatch = None
+_nodes_built: int = 0
+
+# Approximate memory used by the text of a short key
+KEY_BYTES = sys.getsizeof('') + 16
 
 
 class _Node:
@@ -50,21 +185,30 @@ class _Node:
         Next sibling.
     size : int
         Number of nodes in child-sibling subtree.
+    rank : Optional[int]
+        Rank of the node in the child-sibling tree, once computed by
+        `_rank`.
     
     Notes
     -----
     Null nodes are represented by a value of `None`.
     """
 
+    rank: Optional[int] = None
+
     def __init__(self,
                  key: str,
                  child: MaybeNode = None,
                  sibling: MaybeNode = None):
         # Construct node with given key, first child, and next sibling.
+        global _nodes_built
+        _nodes_built += 1
         self.key = key
         self.child = child
         self.sibling = sibling
         self.size = 1
+        if stats.enabled:
+            stats.add('heap.nodes')
         self.size += child.size if child else 0
         self.size += sibling.size if sibling else 0
 
@@ -73,8 +217,119 @@ class _Node:
         return _Node(self.key, self.child, sibling)
 
 
+# Approximate memory used by a node, excluding its key
+NODE_BYTES = sys.getsizeof(_Node('')) + sys.getsizeof(_Node('').__dict__)
+
+
+class _LazyNode(_Node):
+    """Node of a binary heap file, loaded on first access to its fields.
+
+    Attributes
+    ----------
+    state : HeapState
+        State of the heap loaded from the file.
+    idx : int
+        Index of the node in the file.
+    """
+
+    def __init__(self, state: 'HeapState', idx: int):
+        # Construct node with given index in the file of a heap's state,
+        # reading only its size.
+        self.state = state
+        self.idx = idx
+        self.size = state.file.size[idx]
+
+    def __getattr__(self, name: str):
+        # Load the key, child, and sibling when one is first accessed.
+        if name not in ('key', 'child', 'sibling'):
+            raise AttributeError(name)
+        heap_file = self.state.file
+        self.key = heap_file.key(self.idx)
+        self.child = _file_node(self.state, heap_file.child[self.idx])
+        self.sibling = _file_node(self.state, heap_file.sibling[self.idx])
+        return getattr(self, name)
+
+
+def _file_node(state: 'HeapState', idx: int) -> MaybeNode:
+    # Return the node with given index in the file of a heap's state, or
+    # None if negative.
+    if idx < 0:
+        return None
+    if idx not in state.file_nodes:
+        state.file_nodes[idx] = _LazyNode(state, idx)
+    return state.file_nodes[idx]
+
+
+class HeapState:
+    """A heap and everything cached from it.
+
+    Attributes
+    ----------
+    root : MaybeNode
+        Root of the heap.
+    version : int
+        Counter changed by every mutation.
+    bodies : dict[int, str]
+        Row text after the index column, by index.
+    idx_strs : dict[int, str]
+        Padded index column strings, by index.
+    idx_width : int
+        Width of the index column strings.
+    last_display : tuple[tuple[int, int, int], list[str]]
+        Version and row range of the last display call, and its rows.
+    file : Optional[HeapFile]
+        File the heap was loaded from.
+    file_root : MaybeNode
+        Root loaded from `file`.
+    file_nodes : dict[int, _LazyNode]
+        Nodes loaded from `file`, by index.
+    file_ranks : Optional[list[int]]
+        Ranks of the nodes of `file`, once computed.
+    keys : Optional[KeyIndex]
+        Keys of `indexed_root`, once searched.
+    parents : dict[_Node, MaybeNode]
+        Parent in the child-sibling tree of each node of `indexed_root`.
+    key_nodes : dict[str, list[_Node]]
+        Nodes of `indexed_root` with each key.
+    indexed_root : MaybeNode
+        Root last indexed for search.
+    top : list[str]
+        Keys ranked from `top_root`, highest first.
+    top_rest : MaybeNode
+        Children of the last key ranked.
+    top_root : MaybeNode
+        Root whose keys are ranked in `top`.
+    """
+
+    def __init__(self):
+        # Construct the state of an empty heap.
+        self.root = None
+        self.version = 0
+        self.bodies = {}
+        self.idx_strs = {}
+        self.idx_width = 0
+        self.last_display = ((-1, 0, 0), [])
+        self.file = None
+        self.file_root = None
+        self.file_nodes = {}
+        self.file_ranks = None
+        self.keys = None
+        self.parents = {}
+        self.key_nodes = {}
+        self.indexed_root = None
+        self.top = []
+        self.top_rest = None
+        self.top_root = None
+
+
+# Heap in use, exchanged by `swap`
+_heap: HeapState = HeapState()
+
+
 def init(is_higher: CompareStr,
-         preorder: Iterator[str] = iter([''])):
+         preorder: Iterator[str] = iter(['']),
+         compare_batch: Optional[CompareBatch] = None,
+         engine: str = 'multipass'):
     """Initialize the heap.
 
     Must be called before the other functions in the module are used.
@@ -87,18 +342,32 @@ def init(is_higher: CompareStr,
     preorder : MaybeIterStr, default=iter([''])
         A pre-order sequence of strings, where an empty string represents
         a null node.
+    compare_batch : Optional[CompareBatch], default=None
+        Callback function given a list of independent pairs of strings,
+        returning for each pair whether the first string has a higher
+        priority.  Defaults to calling `is_higher` on each pair in order.
+    engine : str, default='multipass'
+        Strategy used to order the heap, one of `ENGINES`.
     """
     global _is_higher
-    global _root
+    global _compare_batch
+    set_engine(engine)
     _is_higher = is_higher
-    def build_heap() -> MaybeNode:
-        key = next(preorder)
-        if key == '':
-            return None
-        child = build_heap()
-        sibling = build_heap()
-        return _Node(key, child, sibling)
-    _root = build_heap()
+    _changed()
+    _heap.bodies.clear()
+    _heap.keys = None
+    _heap.file_nodes.clear()
+    _compare_batch = compare_batch or (lambda pairs:
+                                       [is_higher(*pair) for pair in pairs])
+    _heap.root = build_snapshot(preorder)
+
+
+def set_engine(engine: str):
+    """Select the strategy used to order the heap, one of `ENGINES`."""
+    global _engine
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+    _engine = engine
 
 
 def to_preorder() -> Iterator[str]:
@@ -106,84 +375,435 @@ def to_preorder() -> Iterator[str]:
 
     Each null node is represented by an empty string.
     """
-    def preorder(node: MaybeNode) -> Iterator[str]:
+    return snapshot_preorder(_heap.root)
+
+
+def snapshot() -> Snapshot:
+    """Return the current heap, unaffected by later mutations."""
+    return _heap.root
+
+
+def snapshot_preorder(heap: Snapshot) -> Iterator[str]:
+    """Return the pre-order sequence of strings in a snapshot.
+
+    Each null node is represented by an empty string.
+    """
+    stack = [heap]
+    while stack:
+        node = stack.pop()
         if node == None:
             yield ''
-            return
+            continue
+        if type(node) is _LazyNode:
+            # The subtree is unchanged from the file, so it is read from
+            # there without loading its nodes.
+            yield from node.state.file.preorder(node.idx)
+            continue
         yield node.key
-        for k in preorder(node.child):
-            yield k
-        for k in preorder(node.sibling):
-            yield k
-    return preorder(_root)
+        stack.append(node.sibling)
+        stack.append(node.child)
+
+
+def build_snapshot(preorder: Iterator[str]) -> Snapshot:
+    """Return a snapshot of the heap with a given pre-order sequence.
+
+    Each null node is represented by an empty string, as in `to_preorder`.
+    """
+    # Each stack entry is [key, child, has_child] for a node whose subtrees
+    # are still being read.
+    stack = []
+    while True:
+        key = next(preorder)
+        if key != '':
+            stack.append([key, None, False])
+            continue
+        node = None
+        while stack:
+            entry = stack[-1]
+            if not entry[2]:
+                entry[1] = node
+                entry[2] = True
+                break
+            stack.pop()
+            node = _Node(entry[0], entry[1], node)
+        else:
+            return node
+
+
+def restore(heap: Snapshot):
+    """Replace the heap with a snapshot."""
+    _heap.root = heap
+    _changed()
+    _heap.bodies.clear()
+
+
+def edges() -> Iterator[tuple[str, str]]:
+    """Return the (parent, child) pairs of keys in the heap.
+
+    Each parent has a higher priority than its children.
+    """
+    stack = [(_heap.root, None)]
+    while stack:
+        node, parent = stack.pop()
+        if node is None:
+            continue
+        if parent is not None:
+            yield parent, node.key
+        stack.append((node.sibling, parent))
+        stack.append((node.child, node.key))
+
+
+def nodes_built() -> int:
+    """Return the number of nodes built so far."""
+    return _nodes_built
+
+
+def swap(state: Optional[HeapState]) -> HeapState:
+    """Replace the heap and its caches with a saved state.
+
+    The heap is replaced with an empty one if `state` is None, ready for
+    `init` or `load`.  Return the state of the heap replaced.
+    """
+    global _heap
+    replaced = _heap
+    _heap = HeapState() if state is None else state
+    return replaced
+
+
+def memory_bytes() -> int:
+    """Return an estimate of the memory used by the heap.
+
+    Of a heap loaded from a binary heap file, only the nodes loaded so far
+    are counted.  Cached display rows are counted as keys.
+    """
+    nodes = len(_heap.file_nodes) if _heap.file else size()
+    return nodes * (NODE_BYTES + KEY_BYTES) + len(_heap.bodies) * KEY_BYTES
+
+
+def _changed():
+    # Record that the heap was mutated.
+    _heap.version += 1
+
+
+def _shift_bodies(after: int, delta: int):
+    # Shift the indices of the cached rows after a given index.
+    _heap.bodies = {i + delta if i > after else i: body
+                    for i, body in _heap.bodies.items()}
+
+
+def _drop_bodies(first: int, last: int):
+    # Discard the cached rows with indices in an inclusive range.
+    for i in [i for i in _heap.bodies if first <= i <= last]:
+        del _heap.bodies[i]
+
+
+def _link(x: _Node, y: _Node, x_is_parent: bool) -> _Node:
+    # Merge two heaps given their comparison, discarding sibling references.
+    parent, child = (x, y) if x_is_parent else (y, x)
+    new_child = child.with_sibling(parent.child)
+    return _Node(parent.key, new_child, None)
 
 
 def _merge_pair(x: _Node, y: _Node) -> tuple[_Node, bool]:
     # Merge two heaps, discarding sibling references.
     # Return the new root and whether node `x` is a parent of node `y`.
     x_is_parent = _is_higher(x.key, y.key)
-    parent, child = (x, y) if x_is_parent else (y, x)
-    new_child = child.with_sibling(parent.child)
-    return _Node(parent.key, new_child, None), x_is_parent
+    if stats.enabled:
+        stats.add('heap.comparisons')
+    return _link(x, y, x_is_parent), x_is_parent
 
 
 def insert(key: str) -> int:
     """Insert key into heap and return its index."""
-    global _root
-    if _root:
-        _root, is_root = _merge_pair(_Node(key), _root)
-        return 0 if is_root else 1
-    _root = _Node(key)
+    if _engine == 'sorted':
+        return _insert_sorted(key)
+    return _insert_merge(key)
+
+
+def _insert_merge(key: str) -> int:
+    # Insert key by merging it with the root.
+    # Return its index.
+    if _heap.root:
+        _heap.root, is_root = _merge_pair(_Node(key), _heap.root)
+        # The heap is displayed unchanged while the comparison is made, so
+        # the version changes only once it is done.
+        _changed()
+        if is_root:
+            _heap.bodies.clear()
+            return 0
+        _drop_bodies(0, 0)
+        _shift_bodies(0, 1)
+        return 1
+    _heap.root = _Node(key)
+    _changed()
     return 0
 
 
-def _pair_siblings(node: MaybeNode) -> MaybeNode:
-    # Merge siblings pairwise.
-    if node == None or node.sibling == None:
-        return node
-    sibling = node.sibling.sibling
-    new_node, _ =_merge_pair(node, node.sibling)
-    return new_node.with_sibling(_pair_siblings(sibling))
+def _insert_sorted(key: str) -> int:
+    # Insert key along the path of first children, found by binary search.
+    # Return its index, which is its depth on the path.
+    path = []
+    node = _heap.root
+    while node:
+        path.append(node)
+        node = node.child
+    lo, hi = 0, len(path)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if stats.enabled:
+            stats.add('heap.comparisons')
+        if _is_higher(key, path[mid].key):
+            hi = mid
+        else:
+            lo = mid + 1
+    if lo < len(path):
+        below = path[lo]
+        node = _Node(key, below.with_sibling(None), below.sibling)
+    else:
+        node = _Node(key)
+    for parent in reversed(path[:lo]):
+        node = _Node(parent.key, node, parent.sibling)
+    _heap.root = node
+    _changed()
+    _drop_bodies(lo, _heap.root.size)
+    return lo
+
+
+def insert_many(keys: list[str]):
+    """Insert keys into heap, merging them together first.
+
+    The keys are merged in a tournament of pairwise rounds, each compared
+    as a batch, and the resulting heap is merged with the root.  This uses
+    as many comparisons as inserting the keys one at a time, but in fewer
+    rounds, and leaves a balanced subtree instead of a long list of
+    children at the root.  The `sorted` engine inserts the keys one at a
+    time instead.
+    """
+    if not keys:
+        return
+    if _engine == 'sorted':
+        for key in keys:
+            _insert_sorted(key)
+        return
+    node = None
+    for key in reversed(keys):
+        node = _Node(key, None, node)
+    node = _merge_siblings(node, multipass=True)
+    _heap.root = _merge_pair(node, _heap.root)[0] if _heap.root else node
+    _changed()
+    _heap.bodies.clear()
+
+
+def _pair_siblings(node: MaybeNode) -> MergeSteps:
+    # Merge siblings pairwise from left to right.
+    # Yield the key pairs to compare and receive the answers.
+    pairs = []
+    while node and node.sibling:
+        pairs.append((node, node.sibling))
+        node = node.sibling.sibling
+    answers = yield [(x.key, y.key) for x, y in pairs]
+    for (x, y), x_is_parent in reversed(list(zip(pairs, answers))):
+        node = _link(x, y, x_is_parent).with_sibling(node)
+    return node
+
+
+def _multipass_steps(node: _Node) -> MergeSteps:
+    # Repeatedly merge siblings pairwise into a single heap.
+    # Yield the key pairs of each pass and receive the answers.
+    while node.sibling:
+        node = yield from _pair_siblings(node)
+    return node
 
 
-def _merge_siblings(node: _Node) -> _Node:
-    # Recursively merge siblings pairwise into a single heap.
-    if node.sibling == None:
+def _twopass_steps(node: _Node) -> MergeSteps:
+    # Merge siblings pairwise, then merge the results from right to left.
+    # Yield the key pairs of the pairwise pass, then each single pair.
+    if not node.sibling:
         return node
-    return _merge_siblings(_pair_siblings(node))
+    node = yield from _pair_siblings(node)
+    nodes = []
+    while node:
+        nodes.append(node)
+        node = node.sibling
+    node = nodes.pop()
+    for x in reversed(nodes):
+        [x_is_parent] = yield [(x.key, node.key)]
+        node = _link(x, node, x_is_parent)
+    return node
+
+
+def _rank(node: MaybeNode) -> int:
+    # Return the rank of a node in the child-sibling tree, or -1 for None,
+    # computing and caching the ranks below it that aren't known yet.
+    # Each node's rank follows from its child's and sibling's by the type-1
+    # rank rule: one more than theirs if equal, else the larger.
+    if node is None:
+        return -1
+    stack = [node]
+    while stack:
+        x = stack[-1]
+        if x.rank is not None:
+            stack.pop()
+        elif type(x) is _LazyNode:
+            x.rank = _file_rank(x.state, x.idx)
+            stack.pop()
+        else:
+            unknown = [y for y in (x.child, x.sibling)
+                       if y is not None and y.rank is None]
+            if unknown:
+                stack.extend(unknown)
+                continue
+            stack.pop()
+            left = x.child.rank if x.child else -1
+            right = x.sibling.rank if x.sibling else -1
+            x.rank = left + 1 if left == right else max(left, right)
+    return node.rank
+
+
+def _file_rank(state: HeapState, idx: int) -> int:
+    # Return the rank of the node with given index in the file of a heap's
+    # state, computing the ranks of all its nodes on first use.  Children
+    # and siblings come after their node in pre-order, so the ranks are
+    # computed backwards.
+    if state.file_ranks is None:
+        child, sibling = state.file.child, state.file.sibling
+        state.file_ranks = ranks = [0] * len(state.file)
+        for i in range(len(state.file) - 1, -1, -1):
+            left = ranks[child[i]] if child[i] >= 0 else -1
+            right = ranks[sibling[i]] if sibling[i] >= 0 else -1
+            ranks[i] = left + 1 if left == right else max(left, right)
+    return state.file_ranks[idx]
+
+
+def _rankpairing_steps(node: _Node) -> MergeSteps:
+    # Link siblings of equal rank in passes until all ranks differ, then
+    # find the highest of the heaps left by a tournament and make the
+    # others its first children.
+    # Yield the key pairs of each linking pass and of each round.
+    # A heap's rank is one more than its root's child's.
+    heaps = []
+    while node:
+        heaps.append(node)
+        node = node.sibling
+    while True:
+        pairs = []
+        unlinked = {}       # Heap not linked in this pass, by rank
+        for x in heaps:
+            rank = _rank(x.child) + 1
+            if rank in unlinked:
+                pairs.append((unlinked.pop(rank), x))
+            else:
+                unlinked[rank] = x
+        if not pairs:
+            break
+        answers = yield [(x.key, y.key) for x, y in pairs]
+        heaps = [_link(x, y, x_is_parent)
+                 for (x, y), x_is_parent in zip(pairs, answers)]
+        heaps += unlinked.values()
+    lower = []
+    while len(heaps) > 1:
+        pairs = list(zip(heaps[0::2], heaps[1::2]))
+        answers = yield [(x.key, y.key) for x, y in pairs]
+        winners = []
+        for (x, y), x_is_higher in zip(pairs, answers):
+            winners.append(x if x_is_higher else y)
+            lower.append(y if x_is_higher else x)
+        if len(heaps) % 2:
+            winners.append(heaps[-1])
+        heaps = winners
+    top = heaps[0]
+    child = top.child
+    for x in reversed(lower):
+        child = x.with_sibling(child)
+    return _Node(top.key, child, None)
+
+
+def _merge_siblings(node: _Node, multipass: bool = False) -> _Node:
+    # Merge siblings into a single heap as the engine does, or in multiple
+    # passes if given, comparing each pass as a batch.
+    if _engine == 'twopass' and not multipass:
+        steps = _twopass_steps(node)
+    elif _engine == 'rankpairing' and not multipass:
+        steps = _rankpairing_steps(node)
+    else:
+        steps = _multipass_steps(node)
+    try:
+        pairs = next(steps)
+        while True:
+            if stats.enabled:
+                stats.add('heap.comparisons', len(pairs))
+            pairs = steps.send(_compare_batch(pairs))
+    except StopIteration as stop:
+        return stop.value
 
 
 def _concat_siblings(left: MaybeNode, right: MaybeNode) -> MaybeNode:
     # Concatenate two sibling lists.
-    if left == None:
-        return right
-    sibling = _concat_siblings(left.sibling, right)
-    return left.with_sibling(sibling)
+    nodes = []
+    while left:
+        nodes.append(left)
+        left = left.sibling
+    for node in reversed(nodes):
+        right = node.with_sibling(right)
+    return right
+
+
+def _path_to(idx: int) -> tuple[list[tuple[_Node, bool]], _Node]:
+    # Return the path to the node with given pre-order index and the node.
+    # Each path entry holds an ancestor in the child-sibling tree and
+    # whether the path continues through its child (else its sibling).
+    path = []
+    node = _heap.root
+    while idx:
+        right_idx = 1 + (node.child.size if node.child else 0)
+        if idx < right_idx:
+            path.append((node, True))
+            node = node.child
+            idx -= 1
+        else:
+            path.append((node, False))
+            node = node.sibling
+            idx -= right_idx
+    if stats.enabled:
+        stats.add('heap.steps', len(path))
+    return path, node
+
+
+def _copy_path(path: list[tuple[_Node, bool]], node: MaybeNode) -> MaybeNode:
+    # Copy the nodes along a path onto a replacement subtree.
+    # Return the new root.
+    for parent, is_child in reversed(path):
+        if is_child:
+            node = _Node(parent.key, node, parent.sibling)
+        else:
+            node = parent.with_sibling(node)
+    return node
 
 
 def delete(idx: int) -> str:
     """Delete node with given pre-order index and return its key."""
-    global _root
     if idx == 0:
-        key = _root.key
-        _root = _merge_siblings(_root.child) if _root.child else None
+        key, child = _heap.root.key, _heap.root.child
+        _heap.root = _merge_siblings(child) if child else None
+        # The heap is displayed unchanged while the comparisons are made, so
+        # the version changes only once they are done.
+        _changed()
+        _heap.bodies.clear()
         return key
-    key = ''
-    def do_delete(idx: int, node: _Node) -> MaybeNode:
-        # Delete node at pre-order index in subtree and return new root.
-        if idx == 0:
-            nonlocal key
-            key = node.key
-            return _concat_siblings(node.child, node.sibling)
-        right_idx = 1 + (node.child.size if node.child else 0)
-        if idx < right_idx:
-            child = do_delete(idx - 1, node.child)
-            return _Node(node.key, child, node.sibling)
-        else:
-            sibling = do_delete(idx - right_idx, node.sibling)
-            return node.with_sibling(sibling)
-    _root = do_delete(idx, _root)
-    return key
+    path, node = _path_to(idx)
+    _heap.root = _copy_path(path, _concat_siblings(node.child, node.sibling))
+    _changed()
+    # Rows from the parent in the child-sibling tree to the last descendant
+    # of the deleted node may change.
+    parent, is_child = path[-1]
+    if is_child:
+        parent_idx = idx - 1
+    else:
+        parent_idx = idx - 1 - (parent.child.size if parent.child else 0)
+    last_idx = idx + (node.child.size if node.child else 0)
+    _drop_bodies(parent_idx, last_idx)
+    _shift_bodies(last_idx, -1)
+    return node.key
 
 
 def move(idx: int) -> tuple[str, int]:
@@ -196,55 +816,285 @@ def move(idx: int) -> tuple[str, int]:
     return key, new_idx
 
 
-def rename(idx: int, name: str):
-    """Rename item with given pre-order index."""
-    def do_rename(idx: int, node: _Node):
-        if idx == 0:
-            node.key = name
-            return
-        right_idx = 1 + (node.child.size if node.child else 0)
-        if idx < right_idx:
-            do_rename(idx - 1, node.child)
-        else:
-            do_rename(idx - right_idx, node.sibling)
-    do_rename(idx, _root)
+def promote(idx: int) -> tuple[str, int]:
+    """Merge subtree of node with given pre-order index with the root.
+
+    The node is cut from its parent together with its children and merged
+    with the rest of the heap in a single comparison, for when its key has
+    become higher priority.  Return key of target node and new index.
+    """
+    if idx == 0:
+        return _heap.root.key, 0
+    path, node = _path_to(idx)
+    rest = _copy_path(path, node.sibling)
+    _heap.root, is_root = _merge_pair(node.with_sibling(None), rest)
+    # The heap is displayed unchanged while the comparison is made, so the
+    # rows are discarded only once it is done.
+    _changed()
+    _heap.bodies.clear()
+    return node.key, 0 if is_root else 1
+
+
+def rename(idx: int, name: str) -> str:
+    """Rename item with given pre-order index and return its previous key."""
+    path, node = _path_to(idx)
+    _heap.root = _copy_path(path, _Node(name, node.child, node.sibling))
+    _changed()
+    _heap.bodies.pop(idx, None)
+    return node.key
+
+
+def key_at(idx: int) -> str:
+    """Return key of item with given pre-order index."""
+    if _heap.root and _heap.root is _heap.file_root:
+        return _heap.file.key(idx)
+    return _path_to(idx)[1].key
+
+
+def load(heap_file: 'HeapFile'):
+    """Replace the heap with the nodes of a binary heap file.
+
+    Nodes are read from the file as they are accessed, so the file must
+    remain unchanged while the heap is in use.
+    """
+    _changed()
+    _heap.bodies.clear()
+    _heap.keys = None
+    _heap.file = heap_file
+    _heap.file_ranks = None
+    _heap.file_nodes.clear()
+    _heap.root = _heap.file_root = _file_node(_heap,
+                                              0 if len(heap_file) else -1)
 
 
 def is_empty() -> bool:
     """Check if heap is empty."""
-    return _root == None
+    return _heap.root == None
 
 
 def is_valid_idx(idx: int) -> bool:
     """Check if number is a valid pre-order index."""
     if is_empty():
         return False
-    return idx >= 0 and idx < _root.size
+    return idx >= 0 and idx < _heap.root.size
 
 
-def display() -> Iterator[str]:
-    """Return the strings used to visually display the heap."""
-    if is_empty():
-        return iter([])
-    num_digits = len(str(_root.size - 1))
-    idx = 0
-    def do_display(node: MaybeNode, prefix: str) -> Iterator[str]:
-        if node == None:
-            return
-        nonlocal idx
-        idx_str = f"{idx:>{num_digits}}"
-        idx += 1
+def size() -> int:
+    """Return the number of items in the heap."""
+    return _heap.root.size if _heap.root else 0
+
+
+def _idx_str(idx: int) -> str:
+    # Return the index column string of a row.
+    width = len(str(_heap.root.size - 1))
+    if width != _heap.idx_width:
+        _heap.idx_strs.clear()
+        _heap.idx_width = width
+    if idx not in _heap.idx_strs:
+        _heap.idx_strs[idx] = f"{idx:>{width}}"
+    return _heap.idx_strs[idx]
+
+
+def _file_descend(node: '_LazyNode',
+                  offset: int,
+                  prefix: str,
+                  stack: list[tuple[_Node, str]]) -> tuple[_Node, str]:
+    # Return the node at a pre-order offset in the child-sibling subtree of
+    # a file node, and its display prefix.  Push the siblings still to be
+    # displayed onto the stack.
+    # The subtree is stored contiguously in the file, so the target is found
+    # by index, then its ancestors by parent.
+    state = node.state
+    parent = state.file.parent
+    target = node.idx + offset
+    ancestors = []
+    idx = target
+    while parent[idx] != parent[node.idx]:
+        idx = parent[idx]
+        ancestors.append(idx)
+    for idx in reversed(ancestors):
+        sibling = state.file.sibling[idx]
+        if sibling >= 0:
+            stack.append((_file_node(state, sibling), prefix))
+        prefix += '║' if sibling >= 0 else ' '
+    return _file_node(state, target), prefix
+
+
+def _render_bodies(start: int, end: int):
+    # Cache the row text after the index column for a range of indices.
+    # Walk down to the first row by subtree size, keeping the siblings
+    # still to be displayed and the prefix of each.
+    stack = []
+    node, prefix = _heap.root, ''
+    idx = start
+    while idx:
+        if type(node) is _LazyNode:
+            node, prefix = _file_descend(node, idx, prefix, stack)
+            break
+        right_idx = 1 + (node.child.size if node.child else 0)
+        if idx < right_idx:
+            if node.sibling:
+                stack.append((node.sibling, prefix))
+            prefix += '║' if node.sibling else ' '
+            node = node.child
+            idx -= 1
+        else:
+            node = node.sibling
+            idx -= right_idx
+    stack.append((node, prefix))
+    if stats.enabled:
+        stats.add('heap.rows_rendered', end - start)
+    for idx in range(start, end):
+        node, prefix = stack.pop()
         c2 = '╦' if node.child else '═'
         if node.sibling:
             c1 = '╠'
             c0 = '║'
+            stack.append((node.sibling, prefix))
         else:
             c1 = '╚'
             c0 = ' '
-        yield idx_str + prefix + c1 + c2 + node.key
-        for row in do_display(node.child, prefix + c0):
-            yield row
-        for row in do_display(node.sibling, prefix):
-            yield row
-    return do_display(_root, '')
+        if node.child:
+            stack.append((node.child, prefix + c0))
+        _heap.bodies[idx] = prefix + c1 + c2 + node.key
+
+
+def display(start: int = 0, count: Optional[int] = None) -> Iterator[str]:
+    """Return the strings used to visually display the heap.
+
+    Optionally display only `count` rows starting at pre-order index
+    `start`, skipping the rows before it by subtree size.
+    """
+    end = size() if count is None else min(start + count, size())
+    call = (_heap.version, start, end)
+    if call != _heap.last_display[0]:
+        if any(idx not in _heap.bodies for idx in range(start, end)):
+            _render_bodies(start, end)
+        rows = [_idx_str(idx) + _heap.bodies[idx] for idx in range(start, end)]
+        _heap.last_display = call, rows
+    return iter(_heap.last_display[1])
+
+
+def find(query: str) -> list[int]:
+    """Return the indices of the items matching a search query.
+
+    An item matches if the query, ignoring case, starts its key or one of
+    the words in it.  Indices are returned in increasing order.
+    """
+    _update_index()
+    known = {_heap.root: 0}
+    return sorted(_index_of(node, known)
+                  for key in _heap.keys.search(query)
+                  for node in _heap.key_nodes[key])
+
 
+def _update_index():
+    # Bring the search index up to date with the heap, visiting only the
+    # nodes added and removed since it was last updated.
+    # Nodes never change, so a node of the indexed heap is still in the
+    # heap with all of its subtree if reached from the root, and the
+    # ancestors of a new node are new too.
+    from keyindex import KeyIndex
+    if _heap.keys is None:
+        _heap.keys = KeyIndex()
+        _heap.parents, _heap.key_nodes = {}, {}
+        _heap.indexed_root = None
+    if _heap.indexed_root is _heap.root:
+        return
+    parents = _heap.parents
+    added = []
+    kept = set()                # Indexed nodes whose parent was replaced
+    stack = [(_heap.root, None)]
+    while stack:
+        node, parent = stack.pop()
+        if node is None:
+            continue
+        if node in parents:
+            kept.add(node)
+        else:
+            added.append(node)
+            stack.append((node.sibling, node))
+            stack.append((node.child, node))
+        parents[node] = parent
+    removed = []
+    stack = [_heap.indexed_root]
+    while stack:
+        node = stack.pop()
+        if node is None or node in kept:
+            continue
+        removed.append(node)
+        del parents[node]
+        stack.append(node.sibling)
+        stack.append(node.child)
+    # Keys are added before they are removed, so that a key whose node was
+    # only copied is never missing from the key index.
+    if not _heap.key_nodes:
+        _heap.keys = KeyIndex(node.key for node in added)
+    else:
+        for node in added:
+            _heap.keys.add(node.key)
+    for node in added:
+        _heap.key_nodes.setdefault(node.key, []).append(node)
+    for node in removed:
+        _heap.keys.remove(node.key)
+        nodes = _heap.key_nodes[node.key]
+        nodes.remove(node)
+        if not nodes:
+            del _heap.key_nodes[node.key]
+    _heap.indexed_root = _heap.root
+    if stats.enabled:
+        stats.add('heap.steps', len(added) + len(removed))
+
+
+def _index_of(node: _Node, known: dict[_Node, int]) -> int:
+    # Return the pre-order index of a node of the indexed heap, walking up
+    # to the nearest ancestor of known index, and add the indices found on
+    # the way to `known`.
+    path = []
+    while node not in known:
+        path.append(node)
+        node = _heap.parents[node]
+    idx = known[node]
+    for child in reversed(path):
+        if child is node.child:
+            idx += 1
+        else:
+            idx += 1 + (node.child.size if node.child else 0)
+        known[child] = idx
+        node = child
+    if stats.enabled:
+        stats.add('heap.steps', len(path))
+    return idx
+
+
+def top_k(k: int, compare_batch: Optional[CompareBatch] = None) -> list[str]:
+    """Return the keys of the `k` highest priority items, highest first.
+
+    The root is ranked first, and each next rank is found by merging the
+    children of the last item ranked as deleting it would, in a copy of the
+    heap sharing its nodes.  Finding rank `k` thus compares only the
+    children of the item ranked `k - 1`, and the answers are those the
+    next deletions of the root will need.  The ranks found are kept until
+    the heap changes, and extended when more are requested.
+
+    Comparisons are answered by `compare_batch` if given, instead of the
+    heap's callbacks.  If it raises `LookupError`, the ranks found so far
+    are returned.
+    """
+    global _compare_batch
+    if _heap.top_root is not _heap.root:
+        _heap.top = [_heap.root.key] if _heap.root else []
+        _heap.top_rest = _heap.root.child if _heap.root else None
+        _heap.top_root = _heap.root
+    saved = _compare_batch
+    _compare_batch = compare_batch or _compare_batch
+    try:
+        while len(_heap.top) < k and _heap.top_rest:
+            node = _merge_siblings(_heap.top_rest)
+            _heap.top.append(node.key)
+            _heap.top_rest = node.child
+    except LookupError:
+        pass
+    finally:
+        _compare_batch = saved
+    return _heap.top[:k]
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Module to read and write heap files in the text and binary formats.
+
+Functions
+---------
+is_binary(filename: str) -> bool
+    Check if a file is in the binary format.
+read_preorder(filename: str) -> Iterator[str]
+    Return the pre-order sequence of strings stored in a file.
+save(filename: str, preorder: Iterator[str])
+    Save a pre-order sequence of strings to a file.
+convert(source: str, target: str)
+    Convert a heap file between formats.
+
+Classes
+-------
+HeapFile
+    Binary heap file opened through a memory map.
+
+Formats
+-------
+The text format has one string per line in pre-order, where an empty line
+represents a null node.
+
+The binary format (version 1) is little-endian, consisting of:
+
+* a header: the magic bytes `MAGIC`, the format version and the number of
+  nodes `n` (unsigned 32-bit integers),
+* the first child, next sibling, parent and child-sibling subtree size of
+  each node (arrays of `n` signed 32-bit integers, -1 for a null node),
+* the offset of each key in the string table (`n + 1` unsigned 32-bit
+  integers, the last being the table's length),
+* the string table of UTF-8 encoded keys.
+
+Nodes are numbered in pre-order, so node 0 is the root.  Files are written
+to a temporary file and then renamed, so a file that is memory-mapped is
+never modified in place.
+
+Usage
+-----
+./heapfile.py source target
+
+Converts a heap file.  The target is written in the binary format if its
+name ends with `BINARY_EXTENSION`, and in the text format otherwise.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Iterator
+
+from data import BINARY_EXTENSION
+
+MAGIC = b'PMHEAP\r\n'
+VERSION = 1
+_HEADER = struct.Struct('<8sII')
+_NULL = -1
+
+
+def is_binary(filename: str) -> bool:
+    """Check if a file is in the binary format."""
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class HeapFile:
+    """Binary heap file opened through a memory map.
+
+    Keys are decoded from the file when requested, so only the nodes that
+    are accessed are read into memory.
+
+    Attributes
+    ----------
+    child : Sequence[int]
+        First child of each node.
+    sibling : Sequence[int]
+        Next sibling of each node.
+    parent : Sequence[int]
+        Parent of each node.
+    size : Sequence[int]
+        Number of nodes in the child-sibling subtree of each node.
+    """
+
+    def __init__(self, filename: str):
+        # Open a binary heap file.
+        with open(filename, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Unsupported heap file: {filename}")
+        self._n = n
+        view = memoryview(self._mmap)
+        pos = _HEADER.size
+        arrays = []
+        for typecode, length in zip('iiiiI', (n, n, n, n, n + 1)):
+            arrays.append(self._array(view[pos:pos + 4 * length], typecode))
+            pos += 4 * length
+        self.child, self.sibling, self.parent, self.size, self._offsets = arrays
+        self._table = view[pos:]
+
+    @staticmethod
+    def _array(view: memoryview, typecode: str):
+        # Return a little-endian integer array in the file, mapped when the
+        # machine is also little-endian.
+        if sys.byteorder == 'little':
+            return view.cast(typecode)
+        a = array(typecode, view)
+        a.byteswap()
+        return a
+
+    def __len__(self) -> int:
+        # Return the number of nodes.
+        return self._n
+
+    def key(self, idx: int) -> str:
+        """Return the key of a node."""
+        start, end = self._offsets[idx], self._offsets[idx + 1]
+        return str(self._table[start:end], 'utf-8')
+
+    def preorder(self, idx: int = 0) -> Iterator[str]:
+        """Return the pre-order sequence of strings in the file.
+
+        Optionally return only the child-sibling subtree of the node with
+        index `idx`.
+        """
+        child, sibling, offsets = self.child, self.sibling, self._offsets
+        table = self._table
+        stack = [idx if self._n else _NULL]
+        pop, push = stack.pop, stack.append
+        while stack:
+            idx = pop()
+            if idx == _NULL:
+                yield ''
+                continue
+            yield str(table[offsets[idx]:offsets[idx + 1]], 'utf-8')
+            push(sibling[idx])
+            push(child[idx])
+
+
+def read_preorder(filename: str) -> Iterator[str]:
+    """Return the pre-order sequence of strings stored in a file."""
+    if is_binary(filename):
+        yield from HeapFile(filename).preorder()
+        return
+    with open(filename, 'r') as f:
+        for line in f:
+            yield line[:-1]
+
+
+def _write_text(f, preorder: Iterator[str]):
+    # Write a pre-order sequence of strings in the text format.
+    for line in preorder:
+        f.write((line + '\n').encode())
+
+
+def _write_binary(f, preorder: Iterator[str]):
+    # Write a pre-order sequence of strings in the binary format.
+    child, sibling, parent, size = (array('i') for _ in range(4))
+    offsets = array('I', [0])
+    table = bytearray()
+    # Nodes whose subtrees are still being read, each stored as its index
+    # until its child subtree is read, then as -2 - index.
+    stack = array('i')
+    while True:
+        key = next(preorder)
+        if key != '':
+            # The node is the first child of the node on top of the stack
+            # if that one has no child yet, else its next sibling.
+            if not stack:
+                parent.append(_NULL)
+            elif stack[-1] < 0:
+                parent.append(parent[-2 - stack[-1]])
+            else:
+                parent.append(stack[-1])
+            stack.append(len(size))
+            table += key.encode()
+            offsets.append(len(table))
+            child.append(_NULL)
+            sibling.append(_NULL)
+            size.append(_NULL)
+            continue
+        node = _NULL
+        while stack:
+            top = stack[-1]
+            if top >= 0:
+                child[top] = node
+                stack[-1] = -2 - top
+                break
+            stack.pop()
+            idx = -2 - top
+            sibling[idx] = node
+            first = child[idx]
+            size[idx] = (1 + (size[first] if first != _NULL else 0)
+                         + (size[node] if node != _NULL else 0))
+            node = idx
+        else:
+            break
+    arrays = (child, sibling, parent, size, offsets)
+    if sys.byteorder != 'little':
+        for a in arrays:
+            a.byteswap()
+    f.write(_HEADER.pack(MAGIC, VERSION, len(size)))
+    for a in arrays:
+        f.write(a.tobytes())
+    f.write(table)
+
+
+def save(filename: str, preorder: Iterator[str]):
+    """Save a pre-order sequence of strings to a file.
+
+    The binary format is used if the filename ends with `BINARY_EXTENSION`.
+    """
+    write = (_write_binary if filename.endswith(BINARY_EXTENSION)
+             else _write_text)
+    temp_filename = filename + '.tmp'
+    with open(temp_filename, 'wb') as f:
+        write(f, preorder)
+    os.replace(temp_filename, filename)
+
+
+def convert(source: str, target: str):
+    """Convert a heap file between formats.
+
+    The format of the target is chosen as in `save`.
+    """
+    save(target, read_preorder(source))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit(f"usage: {sys.argv[0]} source target")
+    convert(sys.argv[1], sys.argv[2])
@@ -1,49 +1,182 @@
 """Module for functions used by the main script.
 
+Commands gather their input from the user and apply it through `session`,
+or through a server when used by a client.
+
 Functions
 ---------
-init(curses_window: curses.window, filename: str) -> str
+init(curses_window: curses.window, filename: str, journal: bool = False,
+     engine: str = 'multipass', autosave: float = 0,
+     undo_levels: int = 100, consolidate: bool = False) -> str
     Initialize the module.
+init_workspace(curses_window: curses.window, directory: str,
+               engine: str = 'multipass', undo_levels: int = 100,
+               memory_limit: int = 256 << 20, consolidate: bool = False) -> str
+    Initialize the module to switch between the heap files of a directory.
+init_client(curses_window: curses.window, run: RunFunc)
+    Initialize the module to apply commands through a callback.
+answer(pairs: list[tuple[str, str]]) -> list[bool]
+    Ask the user for the higher priority item of each pair.
 insert() -> tuple[bool, str, int]:
     Insert an item into the heap.
+bulk() -> tuple[bool, str, int]
+    Insert the items listed in a file into the heap.
+import_items(items: list[str]) -> str
+    Insert items into the heap together.
 delete() -> tuple[bool, str]
     Delete an item from the heap.
 move() -> tuple[bool, str, int]:
     Delete then reinsert an item into the heap.
+promote() -> tuple[bool, str, int]
+    Raise an item and the items below it toward the top of the heap.
 rename() -> tuple[bool, str, int]
     Rename an item in the heap.
+undo() -> tuple[bool, str, int]
+    Undo the last command changing the heap.
+redo() -> tuple[bool, str, int]
+    Redo the last undone command.
+search() -> tuple[bool, str, int]
+    Find an item in the heap by searching as the user types.
+export() -> tuple[bool, str, int]
+    Write the items ranked from highest to lowest priority to a file.
 query_save(filename: str) -> tuple[bool, str]
     Query if the user wants to save, and save to file if so.
+toggle_stats()
+    Show or hide the status line of runtime counters.
+toggle_top()
+    Show or hide the panel of the highest priority items.
+rank_top() -> tuple[bool, str, int]
+    Rank the items of the top items panel.
+switch() -> tuple[bool, str, int]
+    Open another heap file of the workspace.
 get_cmd(msg: str, idx: int) -> str
     Return key from user input while displaying the command guide.
 """
 
+import threading
+from functools import partial
 from os.path import isfile
+from typing import Callable, Optional
 
 import heap
+import session
+import startup
+import stats
 import window
-from data import PROMPT, MESSAGE, KEY
+import workspace
+from window import KEY
+from data import PROMPT, MESSAGE, TOP_K, PROGRESS_SUFFIX, OFFER_DELAY
+
+# Type Aliases
+RunFunc = Callable[[session.Operation], tuple[str, int]]
 
+# Global Variables
+_run: RunFunc = session.run     # Applies an operation to the heap
+_stats_shown: bool = False
+_top_shown: bool = False
+_top_lines: Optional[tuple[heap.Snapshot, list[str]]] = None  # For a heap
+_consolidate: bool = False      # Whether comparisons are offered when idle
+_offer: Optional[tuple[heap.Snapshot, Optional[tuple[str, str]]]] = None
 
-def init(curses_window: 'curses.window', filename: str) -> str:
+
+def init(curses_window: 'curses.window',
+         filename: str,
+         journal: bool = False,
+         engine: str = 'multipass',
+         autosave: float = 0,
+         undo_levels: int = 100,
+         consolidate: bool = False) -> str:
     """Initialize the module.
     
     Build heap from saved file, or build empty heap if `filename` is
-    empty, and return result message.
+    empty, and return result message.  The window shows the command guide
+    while the file is loaded in the background, and keys pressed meanwhile
+    are handled once it is loaded.  If `consolidate` is set, the
+    comparisons deleting the top item will need are offered while waiting
+    for a command (see `get_cmd`).  See `session.init` for the other
+    parameters.
     """
-    window.init(curses_window, heap.display)
-    if filename:
-        with open(filename, 'r') as f:
-            preorder = (s[:-1] for s in f)
-            heap.init(_is_higher, preorder)
-        return MESSAGE['OPENED'] + filename
-    else:
-        heap.init(_is_higher)
-        return MESSAGE['EMPTY_HEAP']
+    global _run
+    global _consolidate
+    window.init(curses_window, heap.display, heap.size)
+    _run = session.run
+    _consolidate = consolidate
+    startup.mark('init window')
+    if not filename:
+        return session.init(filename, _is_higher, _is_higher_batch, journal,
+                            engine, autosave=autosave,
+                            undo_levels=undo_levels)
+    return _load(filename, lambda: session.init(
+        filename, _is_higher, _is_higher_batch, journal, engine,
+        autosave=autosave, undo_levels=undo_levels), at_startup=True)
+
+
+def init_workspace(curses_window: 'curses.window',
+                   directory: str,
+                   engine: str = 'multipass',
+                   undo_levels: int = 100,
+                   memory_limit: int = 256 << 20,
+                   consolidate: bool = False) -> str:
+    """Initialize the module to switch between the heap files of a directory.
+
+    The most recently modified heap file is opened, in the background as
+    by `init`, and return result message.  See `workspace.init` for the
+    parameters.
+    """
+    global _run
+    global _consolidate
+    window.init(curses_window, heap.display, heap.size)
+    _run = session.run
+    _consolidate = consolidate
+    startup.mark('init window')
+    return _load(directory, lambda: workspace.init(
+        directory, _is_higher, _is_higher_batch, engine, undo_levels,
+        memory_limit), at_startup=True)
+
+
+def _load(name: str, load: Callable[[], str], at_startup: bool = False) -> str:
+    # Call a function loading a heap in the background, showing the command
+    # guide meanwhile, and mark the startup phases if at startup.
+    # Return its result message, or raise its exception.
+    window.show(MESSAGE['OPENING'] + name)
+    if at_startup:
+        startup.mark('first frame')
+    results = []
+    def run():
+        # Call the function, keeping its result or exception.
+        try:
+            results.append(load())
+        except BaseException as e:
+            results.append(e)
+    threading.Thread(target=run, daemon=True).start()
+    window.wait(lambda: bool(results), MESSAGE['OPENING'] + name)
+    if at_startup:
+        startup.mark('load heap')
+    if isinstance(results[0], BaseException):
+        raise results[0]
+    return results[0]
+
+
+def init_client(curses_window: 'curses.window', run: RunFunc):
+    """Initialize the module to apply commands through a callback.
+
+    The `heap` module is only read, to display the heap and check indices,
+    and `run` is called with each operation in place of `session.run`.
+    """
+    global _run
+    global _consolidate
+    window.init(curses_window, heap.display, heap.size)
+    _run = run
+    _consolidate = False
 
 
-def _is_higher(item1: str, item2: str) -> bool:
-    # Return True if item 1 is of higer priority than item 2.
+class _Paused(Exception):
+    """Raised when the user leaves a comparison to be answered later."""
+
+
+def _is_higher(item1: str, item2: str, pausable: bool = False) -> bool:
+    # Return True if item 1 is of higer priority than item 2.  If pausable,
+    # Escape raises _Paused.
     line1 = MESSAGE['LABEL_1'] + item1
     line2 = MESSAGE['LABEL_2'] + item2
     while True:
@@ -52,16 +185,59 @@ def _is_higher(item1: str, item2: str) -> bool:
             return True
         if key == '2':
             return False
+        if key == KEY['ESCAPE'] and pausable:
+            raise _Paused
+
+
+def _is_higher_batch(pairs: list[tuple[str, str]],
+                     pausable: bool = False) -> list[bool]:
+    # Return for each pair of items whether item 1 is of higher priority,
+    # selecting the answers together on one screen.  If pausable, Escape
+    # raises _Paused.
+    if len(pairs) == 1:
+        return [_is_higher(*pairs[0], pausable)]
+    answers = [None] * len(pairs)
+    row = 0
+    while True:
+        lines = []
+        for (item1, item2), answer in zip(pairs, answers):
+            mark1 = MESSAGE['MARK'] if answer == True else ' '
+            mark2 = MESSAGE['MARK'] if answer == False else ' '
+            lines.append(mark1 + MESSAGE['LABEL_1'] + item1 + '  '
+                         + mark2 + MESSAGE['LABEL_2'] + item2)
+        key = window.get_key_lines(PROMPT['SELECT_BATCH'], lines, row)
+        if key in ('1', '2'):
+            answers[row] = key == '1'
+            row = min(row + 1, len(pairs) - 1)
+        elif key == KEY['UP']:
+            row = max(row - 1, 0)
+        elif key == KEY['DOWN']:
+            row = min(row + 1, len(pairs) - 1)
+        elif key in KEY['ENTER_KEYS'] and None not in answers:
+            return answers
+        elif key == KEY['ESCAPE'] and pausable:
+            raise _Paused
+
+
+def answer(pairs: list[tuple[str, str]]) -> list[bool]:
+    """Ask the user for the higher priority item of each pair.
+
+    Return for each pair whether its first item is higher.
+    """
+    return _is_higher_batch(pairs)
+
+
+def _is_printable(c: str) -> bool:
+    # Check if a key is a printable character.
+    return ' ' <= c <= '~'
 
 
 def _input_str(prompt: str) -> str:
     # Get string from user input.
-    def is_printable(c: str) -> bool:
-        return ' ' <= c <= '~'
     curr_str = ''
     while True:
         key = window.get_key_cursor(prompt + curr_str)
-        if is_printable(key):
+        if _is_printable(key):
             curr_str += key
         elif key == KEY['BACKSPACE']:
             curr_str = curr_str[:-1]
@@ -73,16 +249,53 @@ def _input_str(prompt: str) -> str:
     return curr_str.strip()
 
 
+def _search() -> int:
+    # Get the index of an item found by searching as the user types, or -1
+    # if canceled.  Up and Down choose between the matches.
+    query = ''
+    matches = []
+    choice = 0
+    while True:
+        idx = matches[choice] if matches else -1
+        if matches:
+            msg = (f"{MESSAGE['MATCH']}{choice + 1}/{len(matches)}: "
+                   f"{heap.key_at(idx)}")
+        else:
+            msg = MESSAGE['NO_MATCHES'] if query.strip() else ''
+        key = window.get_key_cursor(PROMPT['SEARCH'] + query, idx, msg)
+        if _is_printable(key):
+            query += key
+            matches = heap.find(query)
+            choice = 0
+        elif key == KEY['BACKSPACE']:
+            query = query[:-1]
+            matches = heap.find(query)
+            choice = 0
+        elif key == KEY['DOWN'] and matches:
+            choice = (choice + 1) % len(matches)
+        elif key == KEY['UP'] and matches:
+            choice = (choice - 1) % len(matches)
+        elif key in KEY['ENTER_KEYS']:
+            return idx
+        elif key == KEY['ESCAPE']:
+            return -1
+
+
 def _input_idx(prompt: str) -> int:
-    # Get valid index from user input.
+    # Get valid index from user input, or search for it after '/'.
     curr_str = '0'
     while True:
         idx = int(curr_str) if curr_str else -1
-        key = window.get_key_cursor(prompt + curr_str, idx)
+        selected = heap.key_at(idx) if idx != -1 else ''
+        key = window.get_key_cursor(prompt + curr_str, idx, selected)
         if key.isdigit():
             idx = int(curr_str + key) 
             if heap.is_valid_idx(idx):
                 curr_str = str(idx)
+        elif key == '/':
+            idx = _search()
+            if idx != -1:
+                curr_str = str(idx)
         elif key == KEY['BACKSPACE']:
             curr_str = curr_str[:-1]
         elif key in KEY['ENTER_KEYS']:
@@ -103,8 +316,35 @@ def insert() -> tuple[bool, str, int]:
     name = _input_str(PROMPT['INSERT'])
     if not name:
         return False, MESSAGE['CANCELED'], -1
-    idx = heap.insert(name)
-    return True, MESSAGE['INSERTED'] + name, idx
+    return True, *_run({'op': 'insert', 'key': name})
+
+
+def import_items(items: list[str]) -> str:
+    """Insert items into the heap together.
+
+    The items are merged with batched prompts before joining the heap.
+    Return result message.
+    """
+    message, _ = _run({'op': 'insert_many', 'keys': items})
+    return message
+
+
+def bulk() -> tuple[bool, str, int]:
+    """Insert the items listed in a file into the heap.
+
+    Return tuple: (completion indicator, result message, item index).
+    """
+    filename = _input_str(PROMPT['IMPORT'])
+    if not filename:
+        return False, MESSAGE['CANCELED'], -1
+    try:
+        with open(filename, 'r') as f:
+            items = session.read_items(f)
+    except OSError:
+        return False, MESSAGE['INVALID_PATH'] + filename, -1
+    if not items:
+        return False, MESSAGE['CANCELED'], -1
+    return True, import_items(items), 0
 
 
 def delete() -> tuple[bool, str]:
@@ -117,8 +357,8 @@ def delete() -> tuple[bool, str]:
     idx = _input_idx(PROMPT['DELETE'])
     if idx == -1:
         return False, MESSAGE['CANCELED']
-    name = heap.delete(idx)
-    return True, MESSAGE['DELETED'] + name
+    message, _ = _run({'op': 'delete', 'idx': idx})
+    return True, message
 
 
 def move() -> tuple[bool, str, int]:
@@ -131,8 +371,23 @@ def move() -> tuple[bool, str, int]:
     idx = _input_idx(PROMPT['MOVE'])
     if idx == -1:
         return False, MESSAGE['CANCELED'], -1
-    name, new_idx = heap.move(idx)
-    return True, MESSAGE['MOVED'] + name, new_idx
+    return True, *_run({'op': 'move', 'idx': idx})
+
+
+def promote() -> tuple[bool, str, int]:
+    """Raise an item and the items below it toward the top of the heap.
+
+    The item is compared only with the top item, and its previous answers
+    are discarded since its priority has changed.
+
+    Return tuple: (completion indicator, result message, item index).
+    """
+    if heap.is_empty():
+        return False, MESSAGE['EMPTY_HEAP'], -1
+    idx = _input_idx(PROMPT['PROMOTE'])
+    if idx == -1:
+        return False, MESSAGE['CANCELED'], -1
+    return True, *_run({'op': 'promote', 'idx': idx})
 
 
 def rename() -> tuple[bool, str, int]:
@@ -148,19 +403,73 @@ def rename() -> tuple[bool, str, int]:
     name = _input_str(PROMPT['RENAME_NAME'])
     if not name:
         return False, MESSAGE['CANCELED'], -1
-    heap.rename(idx, name)
-    return True, MESSAGE['RENAMED'] + name, idx
+    return True, *_run({'op': 'rename', 'idx': idx, 'name': name})
+
+
+def undo() -> tuple[bool, str, int]:
+    """Undo the last command changing the heap.
+
+    The comparison answers given during the command are forgotten.
+
+    Return tuple: (completion indicator, result message, item index).
+    """
+    return True, *_run({'op': 'undo'})
+
+
+def redo() -> tuple[bool, str, int]:
+    """Redo the last undone command.
+
+    Return tuple: (completion indicator, result message, item index).
+    """
+    return True, *_run({'op': 'redo'})
+
+
+def search() -> tuple[bool, str, int]:
+    """Find an item in the heap by searching as the user types.
+
+    Items match if the search starts their name or a word in it.  The
+    chosen item is highlighted, scrolling the heap to it.
+
+    Return tuple: (completion indicator, result message, item index).
+    """
+    if heap.is_empty():
+        return False, MESSAGE['EMPTY_HEAP'], -1
+    idx = _search()
+    if idx == -1:
+        return False, MESSAGE['CANCELED'], -1
+    return False, MESSAGE['FOUND'] + heap.key_at(idx), idx
+
+
+def export() -> tuple[bool, str, int]:
+    """Write the items ranked from highest to lowest priority to a file.
+
+    Only comparisons that can't be inferred are asked.  Pressing Escape at
+    a comparison pauses the export, and exporting to the same file again
+    resumes it.
+
+    Return tuple: (completion indicator, result message, item index).
+    """
+    if heap.is_empty():
+        return False, MESSAGE['EMPTY_HEAP'], -1
+    filename = _input_str(PROMPT['EXPORT'])
+    if not filename:
+        return False, MESSAGE['CANCELED'], -1
+    try:
+        message = session.export(filename,
+                                 partial(_is_higher, pausable=True),
+                                 partial(_is_higher_batch, pausable=True))
+    except _Paused:
+        return True, MESSAGE['PAUSED'] + filename + PROGRESS_SUFFIX, -1
+    except OSError:
+        return False, MESSAGE['INVALID_PATH'] + filename, -1
+    return True, message, -1
 
 
 def _save(filename: str) -> tuple[bool, str]:
-    # Attempt to save the heap as a text file.
+    # Attempt to save the heap and comparison answers.
     # Return tuple: (completion indicator, result message).
-    def write(fname: str):
-        with open(fname, 'w') as f:
-            for line in heap.to_preorder():
-                f.write(line + '\n')
     if filename:
-        write(filename)
+        session.save(filename)
         return True, MESSAGE['SAVED'] + filename
     filename = _input_str(PROMPT['FILENAME'])
     if not filename:
@@ -168,7 +477,7 @@ def _save(filename: str) -> tuple[bool, str]:
     if isfile(filename):
         return False, MESSAGE['FILE_EXISTS'] + filename
     try:
-        write(filename)
+        session.save(filename)
         return True, MESSAGE['SAVED'] + filename
     except FileNotFoundError:
         return False, MESSAGE['INVALID_PATH'] + filename
@@ -194,5 +503,146 @@ def query_save(filename: str) -> tuple[bool, str]:
             return False, MESSAGE['CANCELED']
 
 
-get_cmd = window.get_key_cmd
+def toggle_stats():
+    """Show or hide the status line of runtime counters.
+
+    Counting starts when the status line is first shown, if it hasn't
+    already.
+    """
+    global _stats_shown
+    _stats_shown = not _stats_shown
+    stats.enabled = stats.enabled or _stats_shown
+    window.set_status(stats.summary if _stats_shown else None)
+
+
+def _offered() -> Optional[tuple[str, str]]:
+    # Return the comparison offered for the current heap, if any.
+    if _offer and _offer[0] is heap.snapshot():
+        return _offer[1]
+    return None
+
+
+def _find_offer():
+    # Offer the next comparison deleting the top item needs, unless one
+    # was found for the current heap.
+    global _offer
+    if not _offer or _offer[0] is not heap.snapshot():
+        pairs = session.pending_pairs()
+        _offer = heap.snapshot(), pairs[0] if pairs else None
 
+
+def _offer_line() -> str:
+    # Return the line showing the offered comparison.
+    pair = _offered()
+    if not pair:
+        return ''
+    return (MESSAGE['OFFER'] + MESSAGE['LABEL_1'] + pair[0] + '  '
+            + MESSAGE['LABEL_2'] + pair[1])
+
+
+def get_cmd(msg: str, idx: int) -> str:
+    """Return key from user input while displaying the command guide.
+
+    Display a message and highlight a row (-1 for no highlight).
+
+    If consolidating, once no key is pressed for `OFFER_DELAY`
+    milliseconds, a comparison that deleting the top item will need is
+    offered above the message, and keys 1 and 2 answer it.  Answering the
+    comparisons offered merges the top item's children ahead of time, so
+    that deleting it asks less.
+    """
+    global _offer
+    global _top_lines
+    if not _consolidate:
+        return window.get_key_cmd(msg, idx)
+    window.set_idle(_find_offer, OFFER_DELAY)
+    try:
+        while True:
+            key = window.get_key_cmd(msg, idx, _offer_line)
+            pair = _offered()
+            if key not in ('1', '2') or not pair:
+                return key
+            session.record(*pair, key == '1')
+            _offer = _top_lines = None
+    finally:
+        window.set_idle(None)
+
+
+
+def _top_panel() -> list[str]:
+    # Return the lines of the top items panel, ranking items only by known
+    # answers.  The lines are kept until the heap changes.
+    global _top_lines
+    if _top_lines is None or _top_lines[0] is not heap.snapshot():
+        keys = session.top_k(TOP_K, ask=False)
+        lines = [MESSAGE['TOP'] + str(TOP_K)]
+        lines += [f"{i:>2} {key}" for i, key in enumerate(keys, 1)]
+        if len(keys) < min(TOP_K, heap.size()):
+            lines.append(MESSAGE['UNRANKED'])
+        _top_lines = heap.snapshot(), lines
+    return _top_lines[1]
+
+
+def toggle_top():
+    """Show or hide the panel of the highest priority items.
+
+    Items are ranked in the panel as far as earlier answers allow, after
+    every command.
+    """
+    global _top_shown
+    _top_shown = not _top_shown
+    window.set_panel(_top_panel if _top_shown else None)
+
+
+def rank_top() -> tuple[bool, str, int]:
+    """Rank the items of the top items panel, showing it.
+
+    Only the comparisons needed to rank each next item are asked, and the
+    answers are reused when the items are deleted.
+
+    Return tuple: (completion indicator, result message, item index).
+    """
+    global _top_lines
+    keys = session.top_k(TOP_K)
+    _top_lines = None
+    if not _top_shown:
+        toggle_top()
+    return True, MESSAGE['RANKED'] + str(len(keys)), -1
+
+
+def switch() -> tuple[bool, str, int]:
+    """Open another heap file of the workspace.
+
+    The heap files are listed in place of the heap, the open one marked,
+    to choose from with Up, Down and Enter.  A heap file not loaded is
+    loaded in the background, and if it can't be read the open heap file
+    stays open.
+
+    Return tuple: (completion indicator, result message, item index).
+    """
+    global _top_lines
+    global _offer
+    names = workspace.files()
+    choice = names.index(workspace.current())
+    while True:
+        lines = [(MESSAGE['MARK'] if name == workspace.current() else ' ')
+                 + ' ' + name for name in names]
+        key = window.get_key_lines(PROMPT['SWITCH'], lines, choice)
+        if key == KEY['DOWN']:
+            choice = (choice + 1) % len(names)
+        elif key == KEY['UP']:
+            choice = (choice - 1) % len(names)
+        elif key in KEY['ENTER_KEYS']:
+            break
+        elif key == KEY['ESCAPE']:
+            return False, MESSAGE['CANCELED'], -1
+    name = names[choice]
+    try:
+        message = _load(name, lambda: workspace.switch(name))
+    except OSError:
+        return False, MESSAGE['INVALID_PATH'] + name, -1
+    except Exception:
+        return False, MESSAGE['NOT_HEAP'] + name, -1
+    _top_lines = None
+    _offer = None
+    return False, message, -1
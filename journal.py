@@ -0,0 +1,111 @@
+"""Module for the write-ahead journal of operations applied to a heap file.
+
+Classes
+-------
+Journal
+    Append-only journal of operations made since a heap file was saved.
+
+Notes
+-----
+A journal is a text file of JSON objects, one per line.  The first line
+identifies the snapshot (saved heap file) the journal applies to by its
+inode, size and modification time, and each following line is an
+operation.  After the heap is saved, the journal is rewritten to identify
+the new snapshot, so a crash between the two steps leaves a journal that
+no longer matches and is ignored rather than replayed twice.
+
+A line left incomplete by a crash is ignored.
+"""
+
+import json
+import os
+from typing import Any, Optional
+
+# Type Aliases
+Entry = dict[str, Any]
+
+
+def _snapshot_id(snapshot: str) -> Optional[list[int]]:
+    # Return the identity of a snapshot file, or None if it doesn't exist.
+    try:
+        stat = os.stat(snapshot)
+    except FileNotFoundError:
+        return None
+    return [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+
+class Journal:
+    """Append-only journal of operations made since a heap file was saved.
+
+    Each entry is flushed and synced to disk before `append` returns.
+    """
+
+    def __init__(self, filename: str, snapshot: str):
+        # Open the journal file applying to the given snapshot file.
+        # Any incomplete last line is dropped by rewriting the file.
+        self._filename = filename
+        self._snapshot = snapshot
+        self._entries = self._read() or []
+        self._file = None
+        self._rewrite()
+
+    def _read(self) -> Optional[list[Entry]]:
+        # Return the entries of the journal file, or None if it doesn't
+        # apply to the snapshot.
+        try:
+            with open(self._filename, 'r') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return None
+        try:
+            header = json.loads(lines[0])
+        except (IndexError, ValueError):
+            return None
+        if header.get('snapshot') != _snapshot_id(self._snapshot):
+            return None
+        entries = []
+        for line in lines[1:]:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break
+        return entries
+
+    def __len__(self) -> int:
+        # Return the number of entries.
+        return len(self._entries)
+
+    def entries(self) -> list[Entry]:
+        """Return the entries to replay onto the snapshot."""
+        return list(self._entries)
+
+    def append(self, entry: Entry):
+        """Append an entry and sync it to disk."""
+        self._entries.append(entry)
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _rewrite(self):
+        # Replace the journal file with the header and current entries.
+        if self._file:
+            self._file.close()
+        temp_filename = self._filename + '.tmp'
+        with open(temp_filename, 'w') as f:
+            f.write(json.dumps({'snapshot': _snapshot_id(self._snapshot)})
+                    + '\n')
+            for entry in self._entries:
+                f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_filename, self._filename)
+        self._file = open(self._filename, 'a')
+
+    def reset(self):
+        """Empty the journal after the snapshot has been saved."""
+        self._entries = []
+        self._rewrite()
+
+    def close(self):
+        """Close the journal file."""
+        self._file.close()
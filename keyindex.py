@@ -0,0 +1,111 @@
+"""Module for finding keys by a prefix of the key or of a word in it.
+
+Classes
+-------
+KeyIndex
+    Multiset of keys searchable by prefix.
+
+Notes
+-----
+Each distinct key is indexed under its case-folded text and each of its
+case-folded words, in a sequence of (term, key) pairs kept sorted.  The
+terms starting with a prefix are adjacent in the sequence, so a search costs
+a binary search plus the number of matches.
+
+The sequence is split into blocks of at most `_BLOCK_SIZE` entries, found by
+a binary search over the first entry of each, so adding or removing a key
+moves entries only within one block, plus a reference per block when a
+block is split or emptied.
+"""
+
+import re
+from bisect import bisect_left, bisect_right, insort
+from typing import Iterable
+
+_WORD = re.compile(r'\w+')
+
+# Number of entries at which a block is split in two
+_BLOCK_SIZE = 1024
+
+
+def _terms(key: str) -> set[tuple[str, str]]:
+    # Return the (term, key) entries of a key.
+    folded = key.casefold()
+    return {(term, key) for term in [folded, *_WORD.findall(folded)]}
+
+
+class KeyIndex:
+    """Multiset of keys searchable by prefix.
+
+    A key matches a query if the query, ignoring case, starts the key or
+    one of its words.
+    """
+
+    def __init__(self, keys: Iterable[str] = ()):
+        # Index the given keys.
+        self._counts: dict[str, int] = {}
+        for key in keys:
+            self._counts[key] = self._counts.get(key, 0) + 1
+        entries = sorted(entry for key in self._counts
+                         for entry in _terms(key))
+        half = _BLOCK_SIZE // 2
+        self._blocks = [entries[i:i + half]
+                        for i in range(0, len(entries), half)]
+        self._firsts = [block[0] for block in self._blocks]
+
+    def _block(self, entry: tuple[str, str]) -> int:
+        # Return the index of the block an entry belongs in.
+        return max(bisect_right(self._firsts, entry) - 1, 0)
+
+    def add(self, key: str):
+        """Add a key."""
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        if count:
+            return
+        for entry in _terms(key):
+            if not self._blocks:
+                self._blocks.append([entry])
+                self._firsts.append(entry)
+                continue
+            i = self._block(entry)
+            block = self._blocks[i]
+            insort(block, entry)
+            self._firsts[i] = block[0]
+            if len(block) >= _BLOCK_SIZE:
+                half = len(block) // 2
+                self._blocks[i:i + 1] = [block[:half], block[half:]]
+                self._firsts.insert(i + 1, block[half])
+
+    def remove(self, key: str):
+        """Remove a key that was added."""
+        count = self._counts.pop(key) - 1
+        if count:
+            self._counts[key] = count
+            return
+        for entry in _terms(key):
+            i = self._block(entry)
+            block = self._blocks[i]
+            del block[bisect_left(block, entry)]
+            if block:
+                self._firsts[i] = block[0]
+            else:
+                del self._blocks[i]
+                del self._firsts[i]
+
+    def search(self, query: str) -> list[str]:
+        """Return the distinct keys matching a query, in sorted order."""
+        prefix = query.strip().casefold()
+        if not prefix or not self._blocks:
+            return []
+        keys = set()
+        start = (prefix, '')
+        i = self._block(start)
+        j = bisect_left(self._blocks[i], start)
+        for block in self._blocks[i:]:
+            for term, key in block[j:]:
+                if not term.startswith(prefix):
+                    return sorted(keys)
+                keys.add(key)
+            j = 0
+        return sorted(keys)
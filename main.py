@@ -3,50 +3,176 @@
 
 To open a saved file, provide the filename as the first command line argument,
 otherwise the program starts with an empty heap.
+
+With `--import FILE`, the items listed in a text file (or standard input if
+FILE is '-') are inserted together after the heap is opened.
+
+With `--engine`, the heap is ordered by another strategy; see `heap`.
+
+With `--stats FILE`, runtime counters are collected and saved to FILE as
+JSON on exit.  Press `s` to show or hide them in a status line.
+
+With `--journal`, every operation is journaled next to the file as it is
+made, and the file is saved on quit instead of asking.  The file is created
+if it doesn't exist.
+
+With `--autosave SECONDS`, the file is saved in the background every
+SECONDS while it has changed, and on quit instead of asking.  The file is
+created if it doesn't exist.
+
+With `--consolidate`, while waiting for a command, the comparisons deleting
+the top item will need are offered to be answered ahead of time.
+
+If a directory is given in place of a file, its heap files form a
+workspace: the most recently modified one is opened, and `w` switches to
+another.  Heap files switched away from stay loaded until their estimated
+memory exceeds `--memory MB`, and the heap files that changed are saved
+when dropped and on quit, instead of asking.
+
+With `--startup-profile`, the time taken by each phase of startup, from
+importing modules to the heap being loaded, is printed on exit.
 """
 
-from sys import argv
-from os.path import isfile
+import startup     # First, to time the other imports
+import argparse
+import os
+import sys
+from os.path import isdir, isfile
 import curses
+startup.mark('import stdlib')
 
 import heapio as heap
+import session
+import stats
+import workspace
+from heap import ENGINES
+startup.mark('import modules')
 
 
-def parse_filename() -> str:
-    # Return first command line argument if it's an existing file.
-    if len(argv) > 1:
-        filename = argv[1]
-        if not isfile(filename):
-            raise FileNotFoundError(filename)
-        return filename
-    return ''
+def parse_args() -> argparse.Namespace:
+    # Return command line arguments, checking that the file exists unless
+    # journaling or autosaving, or is a workspace directory.
+    parser = argparse.ArgumentParser(description="Comparison heap program.")
+    parser.add_argument('filename', nargs='?', default='')
+    parser.add_argument('--journal', action='store_true',
+                        help="journal operations and save the file on quit")
+    parser.add_argument('--autosave', type=float, default=0,
+                        metavar='SECONDS',
+                        help="save the file every SECONDS and on quit")
+    parser.add_argument('--undo', type=int, default=100, metavar='LEVELS',
+                        help="commands that can be undone "
+                             "(default: %(default)s)")
+    parser.add_argument('--consolidate', action='store_true',
+                        help="offer comparisons ahead of time while idle")
+    parser.add_argument('--engine', choices=ENGINES, default=ENGINES[0],
+                        help="heap ordering strategy (default: %(default)s)")
+    parser.add_argument('--memory', type=float, default=256, metavar='MB',
+                        help="memory of the heap files kept loaded in a "
+                             "workspace (default: %(default)s)")
+    parser.add_argument('--stats', metavar='FILE',
+                        help="save runtime counters to FILE on exit")
+    parser.add_argument('--import', dest='items', metavar='FILE',
+                        help="insert the items listed in FILE ('-' for stdin)")
+    parser.add_argument('--startup-profile', action='store_true',
+                        help="print startup timings on exit")
+    args = parser.parse_args()
+    if args.journal and not args.filename:
+        parser.error("--journal requires a filename")
+    if args.autosave and not args.filename:
+        parser.error("--autosave requires a filename")
+    if args.autosave and args.journal:
+        parser.error("--autosave can't be combined with --journal")
+    if args.autosave < 0:
+        parser.error("--autosave must be positive")
+    if args.undo < 0:
+        parser.error("--undo can't be negative")
+    if args.memory < 0:
+        parser.error("--memory can't be negative")
+    args.workspace = bool(args.filename) and isdir(args.filename)
+    if args.workspace and (args.journal or args.autosave):
+        parser.error("a workspace can't be journaled or autosaved")
+    if (args.filename and not (args.journal or args.autosave
+                               or args.workspace)
+            and not isfile(args.filename)):
+        raise FileNotFoundError(args.filename)
+    if args.items:
+        args.items = read_import(args.items)
+    return args
 
 
-def main(window: curses.window):
-    filename = parse_filename()
-    message = heap.init(window, filename)
+def read_import(filename: str) -> list[str]:
+    # Return the items to import from a file or standard input.  Standard
+    # input is reopened on the terminal after reading it.
+    if filename != '-':
+        with open(filename, 'r') as f:
+            return session.read_items(f)
+    items = session.read_items(sys.stdin)
+    if not sys.stdin.isatty():
+        tty = os.open('/dev/tty', os.O_RDONLY)
+        os.dup2(tty, sys.stdin.fileno())
+        os.close(tty)
+    return items
+
+
+def main(window: curses.window, args: argparse.Namespace):
+    startup.mark('init curses')
+    filename = args.filename
+    if args.workspace:
+        message = heap.init_workspace(window, filename, args.engine,
+                                      args.undo, int(args.memory * (1 << 20)),
+                                      args.consolidate)
+    else:
+        message = heap.init(window, filename, args.journal, args.engine,
+                            args.autosave, args.undo, args.consolidate)
     idx = -1
-    is_altered = False
+    if args.items:
+        message = heap.import_items(args.items)
     dispatch = {'i': heap.insert,
+                'b': heap.bulk,
                 'd': lambda: heap.delete() + (-1,),
                 'm': heap.move,
-                'r': heap.rename}
+                'p': heap.promote,
+                'r': heap.rename,
+                'u': heap.undo,
+                'U': heap.redo,
+                '/': heap.search,
+                'e': heap.export,
+                'T': heap.rank_top}
+    if args.workspace:
+        dispatch['w'] = heap.switch
     while True:
         cmd = heap.get_cmd(message, idx)
         if cmd == 'q':
-            if not is_altered:
+            if args.workspace:
+                workspace.close()
+                return
+            if args.journal or args.autosave:
+                session.close()
+                return
+            if not session.is_dirty():
                 return
             done, message = heap.query_save(filename)
             if done:
                 return
             idx = -1
+        elif cmd == 's':
+            heap.toggle_stats()
+            idx = -1
+        elif cmd == 't':
+            heap.toggle_top()
+            idx = -1
         elif cmd in dispatch:
-            was_altered, message, idx = dispatch[cmd]()
-            is_altered = is_altered or was_altered
+            _, message, idx = dispatch[cmd]()
         else:
             message = ''
             idx = -1
 
 
-curses.wrapper(main)
-
+args = parse_args()
+startup.mark('parse arguments')
+stats.enabled = bool(args.stats)
+curses.wrapper(main, args)
+if args.stats:
+    stats.dump(args.stats)
+if args.startup_profile:
+    print(startup.report(), file=sys.stderr)
@@ -0,0 +1,341 @@
+"""Module for answering comparisons from previously given answers.
+
+Classes
+-------
+Oracle
+    Comparison callback that memoizes answers and infers new ones through
+    transitivity.
+
+Notes
+-----
+Answers form a directed acyclic graph with an edge from each higher key to
+each lower key.  Reachability is indexed by bitsets: every key is assigned
+a bit, and each key stores the set of keys above it and below it.  A
+comparison is inferred when either key is reachable from the other, so
+only comparisons between unrelated keys reach the wrapped callback.
+
+Adding an edge updates only the keys that reach or are reached through it
+for the first time, each with a single union of bitsets.  Answers added
+together, as when loading a file, are indexed once, each key's bitsets
+being the union of those of its neighbours, computed neighbours first.
+
+Keys are compared as strings, so items sharing a name share their answers.
+
+While `changes` is a list, every answered edge added or removed is logged
+to it, so that the changes can be reverted and reapplied.  Removing edges
+can only change the keys below the keys above them and the keys above the
+keys below them, so only those bitsets are computed again.
+"""
+
+import sys
+from typing import Callable, Iterable, Iterator, Optional
+
+# Type Aliases
+CompareStr = Callable[[str, str], bool]
+CompareBatch = Callable[[list[tuple[str, str]]], list[bool]]
+Change = tuple[bool, str, str]      # Whether added, higher key, lower key
+
+# Approximate memory used by an answered edge, indexed both ways
+_EDGE_BYTES = 100
+
+
+def _bits(mask: int) -> Iterator[int]:
+    # Return the positions of the set bits in a mask, highest first.
+    # Searching the binary string is faster than isolating each low bit.
+    digits = bin(mask)
+    top = len(digits) - 1
+    i = digits.find('1', 2)
+    while i >= 0:
+        yield top - i
+        i = digits.find('1', i + 1)
+
+
+class Oracle:
+    """Comparison callback that memoizes answers and infers new ones.
+
+    Attributes
+    ----------
+    avoided : int
+        Number of comparisons answered without calling the wrapped callback.
+    remember : bool
+        Whether answers from the wrapped callbacks are recorded.  Cheap
+        callbacks need not be, as recording an answer costs time linear in
+        the number of keys.
+    changes : Optional[list[Change]]
+        Log of the answered edges added and removed, if not None.
+    """
+
+    def __init__(self,
+                 is_higher: CompareStr,
+                 compare_batch: Optional[CompareBatch] = None,
+                 remember: bool = True):
+        # Wrap a callback indicating whether the first string has a higher
+        # priority than the second, and optionally one answering a list of
+        # pairs at once.
+        self._is_higher = is_higher
+        self._compare_batch = compare_batch
+        self.remember = remember
+        self.changes: Optional[list[Change]] = None
+        self.avoided = 0
+        self._ids: dict[str, int] = {}
+        self._names: list[Optional[str]] = []  # Key with each bit position
+        self._free_ids: list[int] = []
+        self._above: list[int] = []
+        self._below: list[int] = []
+        self._lower: dict[str, set[str]] = {}    # Answered edges
+        self._higher: dict[str, set[str]] = {}
+
+    def __call__(self, key1: str, key2: str) -> bool:
+        # Return True if key 1 is of higher priority than key 2.
+        known = self.lookup(key1, key2)
+        if known is not None:
+            self.avoided += 1
+            return known
+        answer = self._is_higher(key1, key2)
+        if self.remember:
+            self.record(key1, key2, answer)
+        return answer
+
+    def batch(self, pairs: list[tuple[str, str]]) -> list[bool]:
+        """Return for each pair whether its first key is higher.
+
+        Pairs that cannot be inferred are passed to the wrapped batch
+        callback together, or asked one at a time if there is none.
+        """
+        if not self._compare_batch:
+            return [self(*pair) for pair in pairs]
+        answers = [self.lookup(*pair) for pair in pairs]
+        unknown = [i for i, answer in enumerate(answers) if answer is None]
+        self.avoided += len(pairs) - len(unknown)
+        if unknown:
+            new_answers = self._compare_batch([pairs[i] for i in unknown])
+            for i, answer in zip(unknown, new_answers):
+                answers[i] = answer
+                if self.remember:
+                    self.record(*pairs[i], answer)
+        return answers
+
+    def record(self, key1: str, key2: str, answer: bool):
+        """Record whether key 1 is higher than key 2.
+
+        The answer is ignored if it is already known or contradicted, as
+        answers given together can imply each other.
+        """
+        if key1 == key2 or self.lookup(key1, key2) is not None:
+            return
+        if answer:
+            self.add(key1, key2)
+        else:
+            self.add(key2, key1)
+
+    def _id(self, key: str) -> int:
+        # Return the bit position of a key, assigning one if needed.
+        if key in self._ids:
+            return self._ids[key]
+        if self._free_ids:
+            i = self._free_ids.pop()
+            self._names[i] = key
+        else:
+            i = len(self._above)
+            self._above.append(0)
+            self._below.append(0)
+            self._names.append(key)
+        self._ids[key] = i
+        return i
+
+    def lookup(self, key1: str, key2: str) -> Optional[bool]:
+        """Return whether key 1 is higher than key 2, or None if unknown."""
+        i, j = self._ids.get(key1), self._ids.get(key2)
+        if i is None or j is None or i == j:
+            return None
+        if self._below[i] >> j & 1:
+            return True
+        if self._below[j] >> i & 1:
+            return False
+        return None
+
+    def add(self, higher: str, lower: str):
+        """Record that one key has a higher priority than another.
+
+        The answer must not contradict a known or inferred answer.
+        """
+        self._add_edge(higher, lower)
+        self._connect(higher, lower)
+
+    def add_many(self, edges: Iterable[tuple[str, str]]):
+        """Record many answers, each a higher key and a lower key.
+
+        Faster than `add` for many answers, as reachability is indexed once
+        for all keys.  The answers must not contradict each other or known
+        answers.
+        """
+        for higher, lower in edges:
+            self._add_edge(higher, lower)
+        ids = range(len(self._names))
+        self._reindex(ids, self._lower, self._below)
+        self._reindex(ids, self._higher, self._above)
+
+    def _add_edge(self, higher: str, lower: str):
+        # Record an answered edge, logging it if new.
+        lowers = self._lower.setdefault(higher, set())
+        if lower in lowers:
+            return
+        self._id(higher)
+        self._id(lower)
+        lowers.add(lower)
+        self._higher.setdefault(lower, set()).add(higher)
+        if self.changes is not None:
+            self.changes.append((True, higher, lower))
+
+    def _remove_edge(self, higher: str, lower: str):
+        # Discard an answered edge, logging it.
+        self._lower[higher].discard(lower)
+        self._higher[lower].discard(higher)
+        if self.changes is not None:
+            self.changes.append((False, higher, lower))
+
+    def _connect(self, higher: str, lower: str):
+        # Index that the lower key is reachable from the higher key.
+        # Only the keys that didn't already reach the lower key, or weren't
+        # already reached from the higher key, change.
+        i, j = self._id(higher), self._id(lower)
+        if self._below[i] >> j & 1:
+            return
+        uppers = self._above[i] | 1 << i
+        lowers = self._below[j] | 1 << j
+        new_uppers = uppers & ~self._above[j]
+        new_lowers = lowers & ~self._below[i]
+        for k in _bits(new_uppers):
+            self._below[k] |= lowers
+        for k in _bits(new_lowers):
+            self._above[k] |= uppers
+
+    def _disconnect(self, edges: list[tuple[str, str]]):
+        # Index reachability again after answered edges were removed.
+        # Only the keys below the keys above each removed edge, and the keys
+        # above the keys below it, can change.
+        uppers = lowers = 0
+        for higher, lower in edges:
+            i, j = self._ids[higher], self._ids[lower]
+            uppers |= self._above[i] | 1 << i
+            lowers |= self._below[j] | 1 << j
+        self._reindex(_bits(uppers), self._lower, self._below)
+        self._reindex(_bits(lowers), self._higher, self._above)
+
+    def _reindex(self,
+                 ids: Iterable[int],
+                 edges: dict[str, set[str]],
+                 reached: list[int]):
+        # Compute again the keys reached from the keys with given bit
+        # positions along the answered edges in one direction, those of
+        # their neighbours first.  The other keys must be up to date.
+        todo = set(ids)
+        done = set()
+        for start in todo:
+            if start in done:
+                continue
+            done.add(start)
+            stack = [(start, iter(edges.get(self._names[start], ())))]
+            while stack:
+                i, neighbours = stack[-1]
+                for key in neighbours:
+                    j = self._ids[key]
+                    if j in todo and j not in done:
+                        done.add(j)
+                        stack.append((j, iter(edges.get(key, ()))))
+                        break
+                else:
+                    stack.pop()
+                    mask = 0
+                    for key in edges.get(self._names[i], ()):
+                        j = self._ids[key]
+                        mask |= reached[j] | 1 << j
+                    reached[i] = mask
+
+    def forget(self, key: str):
+        """Discard the answers involving a key.
+
+        Answers inferred through the key are kept between the other keys.
+        """
+        i = self._ids.pop(key, None)
+        if i is None:
+            return
+        lower = set(self._lower.get(key, ()))
+        higher = set(self._higher.get(key, ()))
+        for l in lower:
+            self._remove_edge(key, l)
+        for h in higher:
+            self._remove_edge(h, key)
+        self._lower.pop(key, None)
+        self._higher.pop(key, None)
+        for h in higher:
+            for l in lower:
+                self._add_edge(h, l)
+        mask = ~(1 << i)
+        for k in _bits(self._above[i] | self._below[i]):
+            self._above[k] &= mask
+            self._below[k] &= mask
+        self._above[i] = self._below[i] = 0
+        self._names[i] = None
+        self._free_ids.append(i)
+
+    def revert(self, changes: list[Change]):
+        """Undo logged changes, the most recent first."""
+        self._apply([(not added, higher, lower)
+                     for added, higher, lower in reversed(changes)])
+
+    def reapply(self, changes: list[Change]):
+        """Redo logged changes that were reverted."""
+        self._apply(changes)
+
+    def _apply(self, changes: list[Change]):
+        # Add and remove answered edges, then index reachability again for
+        # the keys whose edges differ from before.  Added edges are left out
+        # until the removed ones are indexed, then connected one by one.
+        before = {}
+        for add, higher, lower in changes:
+            if (higher, lower) not in before:
+                before[higher, lower] = lower in self._lower.get(higher, ())
+            if add:
+                self._add_edge(higher, lower)
+            else:
+                self._remove_edge(higher, lower)
+        added = []
+        removed = []
+        for (higher, lower), present in before.items():
+            if lower in self._lower.get(higher, ()) and not present:
+                added.append((higher, lower))
+                self._lower[higher].discard(lower)
+                self._higher[lower].discard(higher)
+            elif lower not in self._lower.get(higher, ()) and present:
+                removed.append((higher, lower))
+        if removed:
+            self._disconnect(removed)
+        for higher, lower in added:
+            self._lower[higher].add(lower)
+            self._higher[lower].add(higher)
+            self._connect(higher, lower)
+
+    def answers(self) -> Iterator[tuple[str, str]]:
+        """Return the recorded (higher, lower) pairs of keys."""
+        for higher, lowers in self._lower.items():
+            for lower in lowers:
+                yield higher, lower
+
+    def memory_bytes(self) -> int:
+        """Return an estimate of the memory used by the answers."""
+        bitsets = (sum(map(sys.getsizeof, self._above))
+                   + sum(map(sys.getsizeof, self._below)))
+        edges = sum(len(lowers) for lowers in self._lower.values())
+        return bitsets + edges * _EDGE_BYTES
+
+    def load(self, filename: str):
+        """Record the answers saved in a file."""
+        with open(filename, 'r') as f:
+            self.add_many(line[:-1].split('\t') for line in f)
+
+    def save(self, filename: str):
+        """Save the recorded answers to a file."""
+        with open(filename, 'w') as f:
+            for higher, lower in self.answers():
+                f.write(higher + '\t' + lower + '\n')
@@ -0,0 +1,106 @@
+"""Module for ranking items with few comparisons.
+
+Functions
+---------
+merge_insertion(items: list[str], is_higher: CompareStr,
+                compare_batch: Optional[CompareBatch] = None) -> list[str]
+    Return the items sorted from highest to lowest priority.
+
+Notes
+-----
+Items are sorted by Ford-Johnson merge-insertion, which needs close to the
+minimum of log2(n!) comparisons.  The items are paired off and each pair
+compared, the lower item of each pair is sorted recursively, then the
+higher items are inserted by binary search.  Each higher item is known to
+be above its pair's lower item, so only the items above that one are
+searched, and the higher items are inserted in an order (following the
+Jacobsthal numbers) that keeps each search within 2^k - 1 items, so it
+takes at most k comparisons.
+
+The comparisons pairing off items in each round are independent, so they
+are answered together by `compare_batch`.  Items with equal names are
+never compared.
+"""
+
+from typing import Callable, Iterator, Optional
+
+# Type Aliases
+CompareStr = Callable[[str, str], bool]
+CompareBatch = Callable[[list[tuple[str, str]]], list[bool]]
+CompareIds = Callable[[int, int], bool]
+CompareIdsBatch = Callable[[list[tuple[int, int]]], list[bool]]
+
+
+def merge_insertion(items: list[str],
+                    is_higher: CompareStr,
+                    compare_batch: Optional[CompareBatch] = None) -> list[str]:
+    """Return the items sorted from highest to lowest priority.
+
+    Parameters
+    ----------
+    items : list[str]
+        Items to sort.
+    is_higher : CompareStr
+        Callback function indicating whether the first item has a higher
+        priority than the second.
+    compare_batch : Optional[CompareBatch], default=None
+        Callback function answering a list of independent pairs of items at
+        once.  Defaults to calling `is_higher` on each pair in order.
+    """
+    if compare_batch is None:
+        compare_batch = lambda pairs: [is_higher(*pair) for pair in pairs]
+
+    def higher(i: int, j: int) -> bool:
+        # Return True if item i is higher than item j.
+        return items[i] == items[j] or is_higher(items[i], items[j])
+
+    def higher_batch(pairs: list[tuple[int, int]]) -> list[bool]:
+        # Return for each pair of indices whether the first item is higher.
+        answers = iter(compare_batch([(items[i], items[j]) for i, j in pairs
+                                      if items[i] != items[j]]))
+        return [items[i] == items[j] or next(answers) for i, j in pairs]
+
+    ranked = _sort(list(range(len(items))), higher, higher_batch)
+    return [items[i] for i in ranked]
+
+
+def _sort(ids: list[int],
+          higher: CompareIds,
+          higher_batch: CompareIdsBatch) -> list[int]:
+    # Return the item indices sorted from highest to lowest priority.
+    if len(ids) < 2:
+        return ids
+    pairs = list(zip(ids[0::2], ids[1::2]))
+    upper = {}      # Higher item of each pair, by its lower item
+    for (i, j), answer in zip(pairs, higher_batch(pairs)):
+        if answer:
+            upper[j] = i
+        else:
+            upper[i] = j
+    chain = _sort(list(upper), higher, higher_batch)
+    pending = [upper[i] for i in chain]
+    if len(ids) % 2:
+        pending.append(ids[-1])
+    ranked = [pending[0]] + chain
+    for k in _insertion_order(len(pending)):
+        # Search above the pair's lower item, if the item has a pair.
+        end = ranked.index(chain[k]) if k < len(chain) else len(ranked)
+        start = 0
+        while start < end:
+            mid = (start + end) // 2
+            if higher(ranked[mid], pending[k]):
+                start = mid + 1
+            else:
+                end = mid
+        ranked.insert(start, pending[k])
+    return ranked
+
+
+def _insertion_order(n: int) -> Iterator[int]:
+    # Return the indices 1 to n - 1 of pending items in insertion order:
+    # each group ends at the next Jacobsthal number and is inserted from
+    # its last index down.
+    done, end = 1, 3
+    while done < n:
+        yield from range(min(end, n) - 1, done - 1, -1)
+        done, end = end, end + 2 * done
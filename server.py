@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""Script to share one heap file with several clients over a local socket.
+
+Usage
+-----
+./server.py [--socket PATH] [--engine ENGINE] [--journal] filename
+
+Opens the heap file, or starts an empty heap if it doesn't exist, and
+listens on a Unix socket (the filename followed by `SOCKET_SUFFIX` by
+default) for clients such as `client.py`.  The file is saved when the
+server is stopped with Ctrl+C, unless an operation was interrupted, since
+it may have been partly applied.
+
+Protocol
+--------
+Messages are JSON objects, one per line.  Requests from a client are
+session operations (see `session`) with an `id` chosen by the client, and
+optionally the key expected at `idx`, so that an index chosen from an
+outdated view of the heap is refused:
+
+    {"id": 1, "op": "delete", "idx": 3, "expect": "b"}
+
+Other requests are `{"id", "op": "display", "start", "count"}` for rows of
+the heap display and `{"id", "op": "save", "filename"}`, the filename being
+optional.  Replies are
+
+    {"type": "result", "id", "message", "idx"}   (or "rows" for display)
+    {"type": "error", "id", "error"}
+
+Operations are applied one at a time, in the order received.  Comparisons
+an operation needs are sent to connected clients as
+
+    {"type": "compare", "qid", "pairs": [[item1, item2], ...]}
+
+and answered with `{"op": "answer", "qid", "answers": [bool, ...]}`, each
+answer telling whether the first item is higher.  A batch of independent
+comparisons is split into one part per connected client, and each part
+goes to the next client that is not answering another, so the parts are
+answered in parallel.  A part is sent again if its client disconnects.
+
+After every operation, and on connecting, each client is sent the heap as
+`{"type": "heap", "preorder": [...]}`, in the format of `heap.init`.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+from typing import Any, Optional
+
+import heap
+import session
+from data import MESSAGE, SOCKET_SUFFIX
+
+# Type Aliases
+Message = dict[str, Any]
+Chunk = tuple[list[list[str]], asyncio.Future]
+
+# Global Variables
+_loop: asyncio.AbstractEventLoop = None
+_filename: str = ''
+_clients: set['_Client'] = set()
+_chunks: asyncio.Queue = None   # Parts of comparison batches to be answered
+_lock: asyncio.Lock = None      # Held while an operation is applied
+_preorder: list[str] = []       # Heap after the last operation
+_rows: list[str] = []           # Heap display after the last operation
+_interrupted: bool = False      # Whether an operation failed partway
+
+
+class _Client:
+    # Connection to a client, answering comparisons whenever it is free.
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self._writer = writer
+        self._qid = 0
+        self._answers: Optional[asyncio.Future] = None
+        self.task = asyncio.create_task(self._answer_chunks())
+
+    async def send(self, message: Message):
+        # Send a message, ignoring a closed connection.
+        if self._writer.is_closing():
+            return
+        self._writer.write(json.dumps(message).encode() + b'\n')
+        try:
+            await self._writer.drain()
+        except ConnectionError:
+            pass
+
+    def answered(self, message: Message):
+        # Accept the answers to the comparisons last sent.
+        answers = self._answers
+        if message.get('qid') != self._qid or not answers or answers.done():
+            raise ValueError("unexpected answers")
+        answers.set_result(message.get('answers'))
+
+    async def _answer_chunks(self):
+        # Send parts of comparison batches until disconnected, putting back
+        # the part being answered if so.
+        while True:
+            chunk: Chunk = await _chunks.get()
+            pairs, future = chunk
+            try:
+                self._qid += 1
+                self._answers = _loop.create_future()
+                await self.send({'type': 'compare', 'qid': self._qid,
+                                 'pairs': pairs})
+                answers = await self._answers
+            except asyncio.CancelledError:
+                _chunks.put_nowait(chunk)
+                raise
+            if (not isinstance(answers, list) or len(answers) != len(pairs)
+                    or not all(isinstance(a, bool) for a in answers)):
+                _chunks.put_nowait(chunk)
+                await self.send({'type': 'error', 'qid': self._qid,
+                                 'error': "invalid answers"})
+                continue
+            if not future.done():
+                future.set_result(answers)
+
+    def close(self):
+        # Stop answering comparisons.
+        self.task.cancel()
+        self._writer.close()
+
+
+async def _ask(pairs: list[tuple[str, str]]) -> list[bool]:
+    # Return the answers to a batch of comparisons, split between clients.
+    size = math.ceil(len(pairs) / max(1, len(_clients)))
+    futures = []
+    for i in range(0, len(pairs), size):
+        future = _loop.create_future()
+        _chunks.put_nowait(([list(pair) for pair in pairs[i:i + size]],
+                            future))
+        futures.append(future)
+    answers = []
+    for part in await asyncio.gather(*futures):
+        answers.extend(part)
+    return answers
+
+
+def _compare_batch(pairs: list[tuple[str, str]]) -> list[bool]:
+    # Return for each pair of items whether item 1 is of higher priority.
+    # Called from the thread applying an operation.
+    return asyncio.run_coroutine_threadsafe(_ask(pairs), _loop).result()
+
+
+def _is_higher(item1: str, item2: str) -> bool:
+    # Return True if item 1 is of higher priority than item 2.
+    return _compare_batch([(item1, item2)])[0]
+
+
+def _heap_message() -> Message:
+    # Return the message sending the heap to a client.
+    return {'type': 'heap', 'preorder': _preorder}
+
+
+def _snapshot():
+    # Record the heap after an operation.
+    global _preorder
+    global _rows
+    _preorder = list(heap.to_preorder())
+    _rows = list(heap.display())
+
+
+def _check(request: Message) -> Message:
+    # Return a valid session operation from a request.
+    op = {k: v for k, v in request.items() if k not in ('id', 'expect')}
+    name = op.get('op')
+    if name == 'insert':
+        if not (isinstance(op.get('key'), str) and op['key']):
+            raise ValueError("missing key")
+        return op
+    if name == 'insert_many':
+        keys = op.get('keys')
+        if not (isinstance(keys, list)
+                and all(isinstance(k, str) and k for k in keys)):
+            raise ValueError("invalid keys")
+        return op
+    if name in ('undo', 'redo'):
+        return op
+    if name not in ('delete', 'move', 'promote', 'rename'):
+        raise ValueError(f"invalid operation: {name!r}")
+    idx = op.get('idx')
+    if type(idx) is not int or not heap.is_valid_idx(idx):
+        raise ValueError(f"invalid index: {idx!r}")
+    if 'expect' in request and heap.key_at(idx) != request['expect']:
+        raise ValueError(f"heap changed: index {idx} is no longer "
+                         f"{request['expect']!r}")
+    if name == 'rename' and not (isinstance(op.get('name'), str)
+                                 and op['name']):
+        raise ValueError("missing name")
+    return op
+
+
+async def _apply(request: Message) -> Message:
+    # Apply an operation, then send the heap to every client.
+    # Return the reply.
+    global _interrupted
+    async with _lock:
+        op = _check(request)
+        try:
+            message, idx = await asyncio.to_thread(session.run, op)
+        except BaseException:
+            _interrupted = True
+            raise
+        _snapshot()
+    for client in list(_clients):
+        await client.send(_heap_message())
+    return {'type': 'result', 'message': message, 'idx': idx}
+
+
+async def _handle(client: _Client, request: Message) -> Optional[Message]:
+    # Return the reply to a request, or None if it needs none.
+    name = request.get('op')
+    if name == 'answer':
+        client.answered(request)
+        return None
+    if name == 'display':
+        start = request.get('start', 0)
+        count = request.get('count', len(_rows))
+        return {'type': 'result', 'rows': _rows[start:start + count]}
+    if name == 'save':
+        filename = request.get('filename') or _filename
+        async with _lock:
+            session.save(filename)
+        return {'type': 'result', 'message': MESSAGE['SAVED'] + filename,
+                'idx': -1}
+    return await _apply(request)
+
+
+async def _reply(client: _Client, request: Message):
+    # Handle a request and send the reply.
+    try:
+        reply = await _handle(client, request)
+    except (ValueError, TypeError, OSError) as e:
+        reply = {'type': 'error', 'error': str(e)}
+    if reply is not None:
+        reply['id'] = request.get('id')
+        await client.send(reply)
+
+
+async def _serve(reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter):
+    # Serve a client until it disconnects.  Requests are handled in
+    # separate tasks, so that answers arrive while an operation waits.
+    client = _Client(writer)
+    _clients.add(client)
+    await client.send(_heap_message())
+    tasks = set()
+    try:
+        async for line in reader:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request is not an object")
+            except ValueError as e:
+                await client.send({'type': 'error', 'error': str(e)})
+                continue
+            task = asyncio.create_task(_reply(client, request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except (ConnectionError, asyncio.CancelledError):
+        pass    # Disconnected, or the server stopped
+    finally:
+        _clients.discard(client)
+        client.close()
+
+
+async def serve(filename: str, socket_path: str, journal: bool, engine: str):
+    """Serve a heap file on a Unix socket until cancelled.
+
+    The file is saved when the server stops, unless an operation was
+    interrupted.
+    """
+    global _loop
+    global _filename
+    global _chunks
+    global _lock
+    _loop = asyncio.get_running_loop()
+    _filename = filename
+    _chunks = asyncio.Queue()
+    _lock = asyncio.Lock()
+    print(session.init(filename, _is_higher, _compare_batch, journal, engine))
+    _snapshot()
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = await asyncio.start_unix_server(_serve, socket_path)
+    print(f"Listening: {socket_path}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        os.unlink(socket_path)
+        for client in list(_clients):
+            client.close()
+        while not _chunks.empty():
+            _chunks.get_nowait()[1].cancel()
+        if _interrupted or _lock.locked():
+            print(MESSAGE['NOT_SAVED'])
+        else:
+            session.save(filename)
+            session.close()
+            print(MESSAGE['SAVED'] + filename)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('filename')
+    parser.add_argument('--socket', metavar='PATH',
+                        help="socket to listen on (default: filename"
+                             f" + {SOCKET_SUFFIX!r})")
+    parser.add_argument('--engine', choices=heap.ENGINES,
+                        default=heap.ENGINES[0])
+    parser.add_argument('--journal', action='store_true',
+                        help="journal operations as they are made")
+    args = parser.parse_args()
+    socket_path = args.socket or args.filename + SOCKET_SUFFIX
+    try:
+        asyncio.run(serve(args.filename, socket_path, args.journal,
+                          args.engine))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,677 @@
+"""Module to apply operations to a heap file, independent of the interface.
+
+Functions
+---------
+init(filename: str, is_higher: CompareStr,
+     compare_batch: Optional[CompareBatch] = None, journal: bool = False,
+     engine: str = 'multipass', remember: bool = True,
+     autosave: float = 0, undo_levels: int = 100) -> str
+    Initialize the module.
+run(op: Operation) -> tuple[str, int]
+    Apply an operation to the heap and return its result.
+top_k(k: int, ask: bool = True) -> list[str]
+    Return the `k` highest priority items, highest first.
+pending_pairs() -> list[tuple[str, str]]
+    Return the comparisons deleting the top item would ask next.
+record(item1: str, item2: str, answer: bool)
+    Remember an answer given outside an operation.
+export(filename: str, is_higher: CompareStr,
+       compare_batch: Optional[CompareBatch] = None) -> str
+    Write the items ranked from highest to lowest priority to a file.
+save(filename: str)
+    Save the heap and comparison answers.
+close()
+    Save the heap if journaling or autosaving, and stop doing so.
+is_dirty() -> bool
+    Check if the heap or answers changed since they were saved.
+swap(state: Optional[SessionState]) -> SessionState
+    Replace the heap, its answers and its undo history with a saved state.
+memory_bytes() -> int
+    Return an estimate of the memory used by the heap and its history.
+read_items(f: TextIO) -> list[str]
+    Return the items listed in a text file, one per line.
+
+Classes
+-------
+SessionState
+    A heap file's heap, answers and undo history.
+
+Operations
+----------
+An operation is a dictionary naming it under 'op', with its arguments:
+
+    {'op': 'insert', 'key': str}
+    {'op': 'insert_many', 'keys': list[str]}
+    {'op': 'delete', 'idx': int}
+    {'op': 'move', 'idx': int}
+    {'op': 'promote', 'idx': int}
+    {'op': 'rename', 'idx': int, 'name': str}
+    {'op': 'undo'}
+    {'op': 'redo'}
+
+Undo and redo restore the heap and the comparison answers to before and
+after an operation.  When journaling, an undo or redo is journaled with the
+heap it restores, the answers it changes and the operation's name, if the
+journal no longer holds the operation that made that version because the
+file was saved since.  Each level keeps the heap's root as it was, sharing
+its unchanged nodes with the other versions, and the answers added and
+discarded by the operation, so it costs memory in proportion to what the
+operation changed.  This cost is estimated from the nodes built and
+answers changed, and counted as `session.history_bytes` when
+`stats.enabled` is set.
+
+Comparisons are answered from the answers saved with the heap when
+possible, and otherwise by the callbacks given to `init`.
+
+Autosaving writes the heap as it was after the last operation, from a
+snapshot taken when the operation completes, on a background thread.  The
+interface never waits for it, except to save the file itself.
+
+When `stats.enabled` is set, the latency of each operation (excluding time
+spent waiting for input), and load and save times and sizes, are counted.
+
+The modules used only for journaling and exporting are imported when first
+needed, to keep startup fast.
+"""
+
+import os
+import sys
+import threading
+import time
+from os.path import isfile
+from typing import Any, Iterator, Optional, TextIO, TYPE_CHECKING
+
+import heap
+import heapfile
+import stats
+from heap import CompareStr, CompareBatch
+from oracle import Oracle, Change
+from data import (MESSAGE, ORACLE_SUFFIX, JOURNAL_SUFFIX, JOURNAL_LIMIT,
+                  PROGRESS_SUFFIX, CSV_EXTENSION)
+
+if TYPE_CHECKING:
+    from journal import Journal
+
+# Type Aliases
+Operation = dict[str, Any]
+Version = tuple[heap.Snapshot, list[Change], str, int]  # Heap, answers
+                                                        # changed, op, bytes
+
+# Global Variables
+_engine: str = 'multipass'
+_journal: Optional['Journal'] = None
+_answers: list[bool] = []               # Comparisons of current operation
+_replay: Optional[Iterator[bool]] = None    # Answers of replayed operation
+_save_lock = threading.Lock()           # Held while writing the file
+_autosave: Optional[threading.Thread] = None
+_autosave_stop = threading.Event()
+_undo_levels: int = 100
+
+# Approximate memory used by a logged answer change
+_CHANGE_BYTES = sys.getsizeof((True, '', '')) + 8
+
+
+class SessionState:
+    """A heap file's heap, answers and undo history.
+
+    Attributes
+    ----------
+    oracle : Optional[Oracle]
+        Comparison answers of the heap.
+    filename : str
+        Name of the heap file.
+    snapshot : heap.Snapshot
+        Heap after the last operation.
+    saved : heap.Snapshot
+        Heap last written to the file.
+    undo : list[Version]
+        Heaps before the latest operations.
+    redo : list[Version]
+        Heaps after the undone operations.
+    history_bytes : int
+        Estimated cost of the versions in `undo` and `redo`.
+    undo_journaled : int
+        Number of the latest versions to undo that replaying the journal
+        makes again.
+    redo_journaled : int
+        Number of the latest versions to redo that replaying the journal
+        makes again.
+    dirty : bool
+        Whether the heap or answers changed since saved to the file.
+    heap : Optional[heap.HeapState]
+        The heap and its caches, while the state is swapped out.
+    """
+
+    def __init__(self):
+        # Construct the state of an empty session.
+        self.oracle = None
+        self.filename = ''
+        self.snapshot = None
+        self.saved = None
+        self.undo = []
+        self.redo = []
+        self.history_bytes = 0
+        self.undo_journaled = 0
+        self.redo_journaled = 0
+        self.dirty = False
+        self.heap = None
+
+
+# Session in use, exchanged by `swap`
+_session: SessionState = SessionState()
+
+
+def init(filename: str,
+         is_higher: CompareStr,
+         compare_batch: Optional[CompareBatch] = None,
+         journal: bool = False,
+         engine: str = 'multipass',
+         remember: bool = True,
+         autosave: float = 0,
+         undo_levels: int = 100) -> str:
+    """Initialize the module.
+
+    Build heap from saved file, or build empty heap if `filename` is
+    empty or doesn't exist, and return result message.  Comparison answers
+    saved alongside the file are reused.
+
+    Parameters
+    ----------
+    filename : str
+        Heap file to open.
+    is_higher : CompareStr
+        Callback function answering a comparison that isn't known.
+    compare_batch : Optional[CompareBatch], default=None
+        Callback function answering a list of comparisons that aren't
+        known.  Defaults to calling `is_higher` on each pair in order.
+    journal : bool, default=False
+        If set, every operation is journaled next to the file and the file
+        is saved whenever the journal grows too long.  Operations left in
+        the journal by a previous session are replayed without asking,
+        each with the heap engine it was made with.
+    engine : str, default='multipass'
+        Strategy used to order the heap, one of `heap.ENGINES`.
+    remember : bool, default=True
+        Whether answers from the callbacks are remembered and saved.
+    autosave : float, default=0
+        If positive, the heap is saved to the file in the background every
+        `autosave` seconds while it has changed.  The answers are saved
+        with it on `close`.  Not to be combined with `journal`, whose
+        entries apply to the file as saved by `save`.
+    undo_levels : int, default=100
+        Number of operations that can be undone.
+    """
+    global _engine
+    global _journal
+    global _autosave
+    global _undo_levels
+    _session.oracle = Oracle(is_higher, compare_batch, remember)
+    _session.filename = filename
+    _session.undo_journaled = _session.redo_journaled = 0
+    _session.dirty = False
+    _engine = engine
+    _undo_levels = undo_levels
+    _drop_versions(_session.undo, len(_session.undo))
+    _drop_versions(_session.redo, len(_session.redo))
+    if filename and isfile(filename):
+        if stats.enabled:
+            start = time.perf_counter()
+        if heapfile.is_binary(filename):
+            heap.init(_compare, iter(['']), _compare_batch, engine)
+            heap.load(heapfile.HeapFile(filename))
+        else:
+            with open(filename, 'r') as f:
+                preorder = (s[:-1] for s in f)
+                heap.init(_compare, preorder, _compare_batch, engine)
+        if isfile(filename + ORACLE_SUFFIX):
+            _session.oracle.load(filename + ORACLE_SUFFIX)
+        if stats.enabled:
+            stats.add('session.load_seconds', time.perf_counter() - start)
+            stats.add('session.load_bytes', os.path.getsize(filename))
+        message = MESSAGE['OPENED'] + filename
+    else:
+        heap.init(_compare, iter(['']), _compare_batch, engine)
+        message = MESSAGE['EMPTY_HEAP']
+    _journal = None
+    if journal:
+        from journal import Journal
+        _journal = Journal(filename + JOURNAL_SUFFIX, filename)
+        for op in _journal.entries():
+            _replay_op(op)
+        if len(_journal):
+            message += f"  ({MESSAGE['REPLAYED']}{len(_journal)})"
+    _session.snapshot = _session.saved = heap.snapshot()
+    if autosave > 0:
+        _autosave_stop.clear()
+        _autosave = threading.Thread(target=_autosave_loop, args=(autosave,),
+                                     daemon=True)
+        _autosave.start()
+    return message
+
+
+def _compare(item1: str, item2: str) -> bool:
+    # Return True if item 1 is of higher priority than item 2, recording
+    # the answer for the journal.
+    if _replay:
+        answer = next(_replay)
+        _session.oracle.record(item1, item2, answer)
+    else:
+        answer = _session.oracle(item1, item2)
+    _answers.append(answer)
+    return answer
+
+
+def _compare_batch(pairs: list[tuple[str, str]]) -> list[bool]:
+    # Return for each pair of items whether item 1 is of higher priority,
+    # recording the answers for the journal.
+    if _replay:
+        answers = [next(_replay) for _ in pairs]
+        for pair, answer in zip(pairs, answers):
+            _session.oracle.record(*pair, answer)
+    else:
+        answers = _session.oracle.batch(pairs)
+    _answers.extend(answers)
+    return answers
+
+
+def _apply(op: Operation) -> tuple[str, int]:
+    # Apply an operation to the heap, keeping the previous version to undo.
+    # Return tuple: (result message, item index).
+    if op['op'] == 'undo':
+        return _undo_op()
+    if op['op'] == 'redo':
+        return _redo_op()
+    _answers.clear()
+    before, built = heap.snapshot(), heap.nodes_built()
+    _session.oracle.changes = []
+    try:
+        result = _apply_op(op)
+    finally:
+        changes, _session.oracle.changes = _session.oracle.changes, None
+    cost = ((heap.nodes_built() - built) * heap.NODE_BYTES
+            + len(changes) * _CHANGE_BYTES)
+    _drop_versions(_session.redo, len(_session.redo))
+    _push_version(_session.undo, (before, changes, op['op'], cost))
+    _drop_versions(_session.undo, len(_session.undo) - _undo_levels)
+    _session.undo_journaled = min(_session.undo_journaled + 1,
+                                  len(_session.undo))
+    _session.redo_journaled = 0
+    return result
+
+
+def _apply_op(op: Operation) -> tuple[str, int]:
+    # Apply an operation other than undo and redo to the heap.
+    # Return tuple: (result message, item index).
+    if op['op'] == 'insert':
+        idx = heap.insert(op['key'])
+        return MESSAGE['INSERTED'] + op['key'], idx
+    if op['op'] == 'insert_many':
+        was_empty = heap.is_empty()
+        heap.insert_many(op['keys'])
+        sequential = len(op['keys']) - was_empty
+        return (f"{MESSAGE['IMPORTED']}{len(op['keys'])}  "
+                f"({MESSAGE['COMPARISONS']}{len(_answers)}, "
+                f"{MESSAGE['SEQUENTIAL']}{sequential})"), 0
+    if op['op'] == 'delete':
+        name = heap.delete(op['idx'])
+        _session.oracle.forget(name)
+        return MESSAGE['DELETED'] + name, -1
+    if op['op'] == 'move':
+        name, idx = heap.move(op['idx'])
+        return MESSAGE['MOVED'] + name, idx
+    if op['op'] == 'promote':
+        _session.oracle.forget(heap.key_at(op['idx']))
+        name, idx = heap.promote(op['idx'])
+        return MESSAGE['PROMOTED'] + name, idx
+    _session.oracle.forget(heap.rename(op['idx'], op['name']))
+    return MESSAGE['RENAMED'] + op['name'], op['idx']
+
+
+def _push_version(versions: list[Version], version: Version):
+    # Keep a version to restore.
+    versions.append(version)
+    _session.history_bytes += version[3]
+    _count_history()
+
+
+def _drop_versions(versions: list[Version], n: int):
+    # Forget the oldest versions.
+    if n <= 0:
+        return
+    _session.history_bytes -= sum(version[3] for version in versions[:n])
+    del versions[:n]
+    _count_history()
+
+
+def _count_history():
+    # Count the versions kept and their estimated cost.
+    if stats.enabled:
+        stats.set('session.history_levels',
+                  len(_session.undo) + len(_session.redo))
+        stats.set('session.history_bytes', _session.history_bytes)
+
+
+def _undo_op() -> tuple[str, int]:
+    # Restore the heap and answers from before the last operation.
+    # Return tuple: (result message, item index).
+    if not _session.undo:
+        return MESSAGE['NO_UNDO'], -1
+    before, changes, name, cost = _session.undo.pop()
+    _session.redo.append((heap.snapshot(), changes, name, cost))
+    _session.undo_journaled = max(_session.undo_journaled - 1, 0)
+    _session.redo_journaled += 1
+    heap.restore(before)
+    _session.oracle.revert(changes)
+    return MESSAGE['UNDONE'] + name, -1
+
+
+def _redo_op() -> tuple[str, int]:
+    # Restore the heap and answers from after the last undone operation.
+    # Return tuple: (result message, item index).
+    if not _session.redo:
+        return MESSAGE['NO_REDO'], -1
+    after, changes, name, cost = _session.redo.pop()
+    _session.undo.append((heap.snapshot(), changes, name, cost))
+    _session.redo_journaled = max(_session.redo_journaled - 1, 0)
+    _session.undo_journaled += 1
+    heap.restore(after)
+    _session.oracle.reapply(changes)
+    return MESSAGE['REDONE'] + name, -1
+
+
+def _is_unjournaled(op: Operation) -> bool:
+    # Return True if an operation is an undo or redo restoring a version
+    # that replaying the journal doesn't make again.
+    if op['op'] == 'undo':
+        return bool(_session.undo) and not _session.undo_journaled
+    if op['op'] == 'redo':
+        return bool(_session.redo) and not _session.redo_journaled
+    return False
+
+
+def _restored_version(op: Operation) -> dict[str, Any]:
+    # Return the fields journaled with an undo or redo just applied,
+    # describing the version it restored.
+    versions = _session.redo if op['op'] == 'undo' else _session.undo
+    _, changes, name, _ = versions[-1]
+    return {'preorder': list(heap.to_preorder()), 'changes': changes,
+            'name': name}
+
+
+def _replay_op(op: Operation):
+    # Apply a journaled operation using its recorded answers.  An undo or
+    # redo journaled with the version it restored first keeps that version
+    # to restore, as it was made before the journal was started.
+    global _replay
+    _replay = iter(op['answers'])
+    heap.set_engine(op.get('engine', 'multipass'))
+    if 'preorder' in op:
+        snapshot = heap.build_snapshot(iter(op['preorder']))
+        changes = [tuple(change) for change in op['changes']]
+        cost = (sum(1 for key in op['preorder'] if key) * heap.NODE_BYTES
+                + len(changes) * _CHANGE_BYTES)
+        _push_version(_session.undo if op['op'] == 'undo' else _session.redo,
+                      (snapshot, changes, op['name'], cost))
+    try:
+        _apply(op)
+    finally:
+        _replay = None
+        heap.set_engine(_engine)
+
+
+def run(op: Operation) -> tuple[str, int]:
+    """Apply an operation to the heap and return its result.
+
+    The operation is journaled with its answers if journaling.
+
+    Return tuple: (result message, item index).
+    """
+    if op['op'] == 'promote' and op['idx'] == 0:
+        # The top item is already highest, so nothing changes.
+        return MESSAGE['PROMOTED'] + heap.key_at(0), 0
+    avoided = _session.oracle.avoided
+    _session.dirty = True
+    unjournaled = _journal is not None and _is_unjournaled(op)
+    if stats.enabled:
+        start = time.perf_counter()
+        waited = stats.counters.get('window.input_seconds', 0)
+    message, idx = _apply(op)
+    _session.snapshot = heap.snapshot()
+    if stats.enabled:
+        # Time spent waiting for answers is not part of the latency.
+        waited = stats.counters.get('window.input_seconds', 0) - waited
+        latency = time.perf_counter() - start - waited
+        stats.add('session.command_seconds', latency)
+        stats.add(f"session.{op['op']}.seconds", latency)
+        stats.add(f"session.{op['op']}.count")
+    if _journal is not None:
+        entry = dict(op, answers=list(_answers), engine=_engine)
+        if unjournaled:
+            entry.update(_restored_version(op))
+        _journal.append(entry)
+        if len(_journal) >= JOURNAL_LIMIT:
+            save(_session.filename)
+    n = _session.oracle.avoided - avoided
+    if n:
+        message += f"  ({MESSAGE['AVOIDED']}{n})"
+    return message, idx
+
+
+def top_k(k: int, ask: bool = True) -> list[str]:
+    """Return the `k` highest priority items, highest first.
+
+    Comparisons are answered as for operations, and remembered, so that
+    deleting the items later asks nothing again.  If `ask` is not set, only
+    the items ranked by known answers are returned, so fewer than `k` may
+    be returned for a larger heap.
+    """
+    if ask:
+        _session.dirty = True
+        return heap.top_k(k)
+    return heap.top_k(k, _known_batch)
+
+
+def pending_pairs() -> list[tuple[str, str]]:
+    """Return the comparisons deleting the top item would ask next.
+
+    These are the unknown pairs of the first batch of the merge that isn't
+    answered by known answers.  Once they are answered, through `record`,
+    the merge goes on to the next batch, so answering the pairs returned
+    until none are left makes deleting the top item ask nothing.
+    """
+    pending = []
+    def capture_batch(pairs: list[tuple[str, str]]) -> list[bool]:
+        # Answer pairs from known answers, or collect the unknown ones.
+        answers = [_session.oracle.lookup(*pair) for pair in pairs]
+        if None in answers:
+            pending.extend(pair for pair, answer in zip(pairs, answers)
+                           if answer is None)
+            raise LookupError("comparison not answered")
+        return answers
+    # Deleting the top item merges its children, as ranking the second does.
+    heap.top_k(2, capture_batch)
+    return pending
+
+
+def record(item1: str, item2: str, answer: bool):
+    """Remember an answer given outside an operation.
+
+    The answer is not journaled, but is journaled with the operations that
+    use it.
+    """
+    _session.oracle.record(item1, item2, answer)
+    _session.dirty = True
+    if stats.enabled:
+        stats.add('session.recorded_answers')
+
+
+def _known_batch(pairs: list[tuple[str, str]]) -> list[bool]:
+    # Return for each pair of items whether item 1 is of higher priority,
+    # or raise LookupError if an answer isn't known.
+    answers = [_session.oracle.lookup(*pair) for pair in pairs]
+    if None in answers:
+        raise LookupError("comparison not answered")
+    return answers
+
+
+def export(filename: str,
+           is_higher: CompareStr,
+           compare_batch: Optional[CompareBatch] = None) -> str:
+    """Write the items ranked from highest to lowest priority to a file.
+
+    The items are sorted by merge-insertion (see `ranking`), and each
+    comparison is first inferred from the saved answers, from the heap
+    (each item is higher than the items below it) and from the answers
+    given to an unfinished export to the same file.  The other comparisons
+    are passed to the callbacks, and their answers are remembered like
+    those of an operation and logged to a progress file next to the export,
+    which is removed once the file is written.  If a callback raises an
+    exception, the export is left unfinished and can be resumed.
+
+    The file lists the items one per line, or as "rank,item" rows if its
+    name ends with `CSV_EXTENSION`.
+
+    Return result message.
+    """
+    import csv
+    import ranking
+    _session.dirty = _session.dirty or _session.oracle.remember
+    progress = filename + PROGRESS_SUFFIX
+    resumed = isfile(progress)
+    asked = 0
+    with open(progress, 'a') as log:
+        def ask_batch(pairs: list[tuple[str, str]]) -> list[bool]:
+            # Answer comparisons by the callbacks, remembering and logging
+            # the answers.
+            nonlocal asked
+            if compare_batch:
+                answers = compare_batch(pairs)
+            else:
+                answers = [is_higher(*pair) for pair in pairs]
+            for (item1, item2), answer in zip(pairs, answers):
+                if _session.oracle.remember:
+                    _session.oracle.record(item1, item2, answer)
+                higher, lower = (item1, item2) if answer else (item2, item1)
+                log.write(higher + '\t' + lower + '\n')
+            log.flush()
+            asked += len(pairs)
+            return answers
+        known = Oracle(lambda item1, item2: ask_batch([(item1, item2)])[0],
+                       ask_batch)
+        known.add_many(_session.oracle.answers())
+        for higher, lower in heap.edges():
+            known.record(higher, lower, True)
+        if resumed:
+            with open(progress, 'r') as f:
+                for line in f:
+                    higher, lower = line[:-1].split('\t')
+                    known.record(higher, lower, True)
+        items = [key for key in heap.to_preorder() if key]
+        ranked = ranking.merge_insertion(items, known, known.batch)
+    with open(filename, 'w', newline='') as f:
+        if filename.endswith(CSV_EXTENSION):
+            writer = csv.writer(f)
+            writer.writerow(['rank', 'item'])
+            writer.writerows(enumerate(ranked, 1))
+        else:
+            f.writelines(item + '\n' for item in ranked)
+    os.remove(progress)
+    return (f"{MESSAGE['EXPORTED']}{filename}  ({MESSAGE['COMPARISONS']}"
+            f"{asked}, {MESSAGE['AVOIDED']}{known.avoided})")
+
+
+def save(filename: str):
+    """Save the heap and comparison answers.
+
+    The journal is emptied if journaling.
+    """
+    if stats.enabled:
+        start = time.perf_counter()
+    with _save_lock:
+        heapfile.save(filename, heap.to_preorder())
+        if filename == _session.filename:
+            _session.saved = _session.snapshot
+    _session.oracle.save(filename + ORACLE_SUFFIX)
+    if filename == _session.filename:
+        _session.dirty = False
+    if stats.enabled:
+        stats.add('session.save_seconds', time.perf_counter() - start)
+        stats.add('session.save_bytes', os.path.getsize(filename))
+    if _journal is not None:
+        _journal.reset()
+        _session.undo_journaled = _session.redo_journaled = 0
+
+
+def _autosave_loop(interval: float):
+    # Save the heap after the last operation every interval while it has
+    # changed, until stopped.  Failures are retried at the next interval.
+    while not _autosave_stop.wait(interval):
+        snapshot = _session.snapshot
+        if snapshot is _session.saved:
+            continue
+        if stats.enabled:
+            start = time.perf_counter()
+        with _save_lock:
+            try:
+                heapfile.save(_session.filename,
+                              heap.snapshot_preorder(snapshot))
+            except OSError:
+                continue
+            _session.saved = snapshot
+        if stats.enabled:
+            stats.add('session.autosave_seconds', time.perf_counter() - start)
+            stats.add('session.autosave_count')
+
+
+def close():
+    """Save the heap if journaling or autosaving, and stop doing so.
+
+    The journal is closed if journaling.
+    """
+    global _autosave
+    if _autosave is not None:
+        _autosave_stop.set()
+        _autosave.join()
+        _autosave = None
+        save(_session.filename)
+    if _journal is not None:
+        save(_session.filename)
+        _journal.close()
+
+
+def is_dirty() -> bool:
+    """Check if the heap or answers changed since they were saved."""
+    return _session.dirty
+
+
+def swap(state: Optional[SessionState]) -> SessionState:
+    """Replace the heap, its answers and its undo history with a saved state.
+
+    The session is emptied if `state` is None, ready for `init`.  Not to be
+    used while journaling or autosaving, which apply to the current file.
+
+    Return the state replaced.
+    """
+    global _session
+    replaced = _session
+    replaced.heap = heap.swap(state.heap if state else None)
+    _session = SessionState() if state is None else state
+    _count_history()
+    return replaced
+
+
+def memory_bytes() -> int:
+    """Return an estimate of the memory used by the heap and its history.
+
+    The heap, its answers and the versions kept to undo are counted.
+    """
+    return (heap.memory_bytes() + _session.oracle.memory_bytes()
+            + _session.history_bytes)
+
+
+def read_items(f: TextIO) -> list[str]:
+    """Return the items listed in a text file, one per line.
+
+    Blank lines are skipped.
+    """
+    return [line.strip() for line in f if line.strip()]
@@ -0,0 +1,38 @@
+"""Module for timing the phases of program startup.
+
+Functions
+---------
+mark(phase: str)
+    Record that a phase of startup has ended.
+report() -> str
+    Return the time taken by each phase, one per line.
+
+Notes
+-----
+The clock starts when this module is imported, so it should be imported
+first, and each phase lasts from the previous mark.  A mark costs one clock
+read, so marks are always recorded and only reported if asked.  For the
+time taken by each imported module, run Python with `-X importtime`.
+"""
+
+import time
+
+# Global Variables
+_start: float = time.perf_counter()
+_marks: list[tuple[str, float]] = []    # Phase and time it ended
+
+
+def mark(phase: str):
+    """Record that a phase of startup has ended."""
+    _marks.append((phase, time.perf_counter()))
+
+
+def report() -> str:
+    """Return the time taken by each phase, one per line, then the total."""
+    lines = []
+    last = _start
+    for phase, end in _marks:
+        lines.append(f"{phase:<16}{(end - last) * 1000:8.1f} ms")
+        last = end
+    lines.append(f"{'total':<16}{(last - _start) * 1000:8.1f} ms")
+    return '\n'.join(lines)
@@ -0,0 +1,59 @@
+"""Module for runtime counters.
+
+Functions
+---------
+add(name: str, amount: float = 1)
+    Add an amount to a counter.
+set(name: str, value: float)
+    Set a counter to a value.
+summary() -> str
+    Return a one-line summary of the main counters.
+dump(filename: str)
+    Save the counters to a JSON file.
+
+Notes
+-----
+Counters are named by module, such as `heap.comparisons`, and times are
+counted in seconds.  Nothing is counted unless `enabled` is set.  Callers
+check `enabled` before counting, and before reading the clock to time
+something, so disabled counters cost a single attribute lookup.
+"""
+
+# Global Variables
+enabled: bool = False
+counters: dict[str, float] = {}
+
+# Label, counter and scale of each summary field
+_SUMMARY = (
+    ("compares", 'heap.comparisons', 1),
+    ("nodes", 'heap.nodes', 1),
+    ("steps", 'heap.steps', 1),
+    ("frames", 'window.frames', 1),
+    ("rows", 'window.rows', 1),
+    ("draw ms", 'window.render_seconds', 1000),
+    ("cmd ms", 'session.command_seconds', 1000),
+    ("wait s", 'window.input_seconds', 1)
+)
+
+
+def add(name: str, amount: float = 1):
+    """Add an amount to a counter."""
+    counters[name] = counters.get(name, 0) + amount
+
+
+def set(name: str, value: float):
+    """Set a counter to a value, for amounts that also decrease."""
+    counters[name] = value
+
+
+def summary() -> str:
+    """Return a one-line summary of the main counters."""
+    return '  '.join(f"{label} {counters.get(name, 0) * scale:,.0f}"
+                     for label, name, scale in _SUMMARY)
+
+
+def dump(filename: str):
+    """Save the counters to a JSON file."""
+    import json
+    with open(filename, 'w') as f:
+        json.dump(counters, f, indent=2, sort_keys=True)
@@ -2,43 +2,111 @@
 
 Functions
 ---------
-init(window: curses.window, get_lines: StrIterFunc)
+init(window: curses.window, get_lines: LinesFunc, get_size: SizeFunc)
     Initialize the window.
-get_key_cmd(msg: str, idx: int) -> str:
+get_key_cmd(msg: str, idx: int,
+            get_pre_msg: Optional[StatusFunc] = None) -> str:
     Return key from user input while displaying the command guide.
-get_key_cursor(prompt: str, highlight: int = -1) -> str
+get_key_cursor(prompt: str, highlight: int = -1, msg: str = '') -> str
     Return key from user input while showing a prompt with a cursor.
 get_key(prompt: str = '', pre_msg: str = '', msg: str = '') -> str
     Return key from user input.
+get_key_lines(prompt: str, lines: list[str], highlight: int) -> str
+    Return key from user input while showing lines in place of the heap.
+show(msg: str)
+    Display the command guide and a message, without the heap.
+wait(is_done: Callable[[], bool], msg: str)
+    Display a message without the heap until a condition is met.
+set_status(get_status: Optional[StatusFunc])
+    Show or hide a status line above the heap.
+set_idle(idle: Optional[VoidFunc], delay: int = 100)
+    Call a function whenever no key is pressed for a while.
+set_panel(get_panel: Optional[PanelFunc])
+    Show or hide a panel of lines beside the heap.
+
+Notes
+-----
+Only the heap rows that fit in the window are requested.  The view scrolls
+to keep the highlighted row visible, and with the Page Up, Page Down, Home
+and End keys.
+
+Each screen is first collected as a frame of row contents, then only the
+rows that differ from the previous frame are repainted.  A side panel is
+part of the contents of the rows it is drawn on.
+
+When `stats.enabled` is set, frames drawn, rows painted, time spent drawing
+and time spent waiting for input are counted.
 """
 
 import curses
-from typing import Callable, Iterator
+import time
+from typing import Callable, Iterable, Iterator, Optional
 
-from data import CMD_GUIDE, ROW, ESC_DELAY
+import stats
+from data import CMD_GUIDE, ROW, ESC_DELAY, PANEL_COLS, WAIT_DELAY
 from colors import COLOR, init_colors
 
+KEY = {
+    'ESCAPE': chr(27),
+    'BACKSPACE': chr(curses.KEY_BACKSPACE),
+    'UP': chr(curses.KEY_UP),
+    'DOWN': chr(curses.KEY_DOWN),
+    'ENTER_KEYS': (chr(curses.KEY_ENTER), '\n', '\r')
+}
+
 # Type Aliases
 VoidFunc = Callable[[], None]
-StrIterFunc = Callable[[], Iterator[str]]
+RowSpec = tuple[str, int, tuple[int, ...], str]     # Text, attribute,
+                                                    # underlines, panel
+LinesFunc = Callable[[int, int], Iterator[str]]
+SizeFunc = Callable[[], int]
+StatusFunc = Callable[[], str]
+PanelFunc = Callable[[], list[str]]
 
 # Global Variables
 _window: curses.window = None
-_get_lines: StrIterFunc = None
-
-
-def init(window: curses.window, get_lines: StrIterFunc):
+_get_lines: LinesFunc = None
+_get_size: SizeFunc = None
+_get_status: Optional[StatusFunc] = None
+_idle: Optional[VoidFunc] = None
+_idle_delay: int = -1       # Input timeout in milliseconds, if idle is set
+_get_panel: Optional[PanelFunc] = None
+_top: int = 0               # Index of the first heap row shown
+_last_highlight: int = -1
+_frame: list[Optional[RowSpec]] = []       # Rows currently on screen
+_next_frame: dict[int, RowSpec] = {}       # Rows of the frame being drawn
+_cursor_col: int = -1                      # Prompt cursor column, if shown
+_cursor_shown: bool = False
+
+_SCROLL_KEYS = (curses.KEY_PPAGE, curses.KEY_NPAGE,
+                curses.KEY_HOME, curses.KEY_END)
+
+
+def init(window: curses.window, get_lines: LinesFunc, get_size: SizeFunc):
     """Initialize the window.
 
     Must be called before the other functions in the module are used.
+
+    Parameters
+    ----------
+    window : curses.window
+        Window to draw in.
+    get_lines : LinesFunc
+        Callback function returning the heap rows given the index of the
+        first row and the number of rows.
+    get_size : SizeFunc
+        Callback function returning the number of heap rows.
     """
     global _window
     global _get_lines
+    global _get_size
     _window = window
     _get_lines = get_lines
+    _get_size = get_size
     init_colors()
     _window.bkgd(COLOR['TEXT'])
     curses.set_escdelay(ESC_DELAY)
+    curses.curs_set(0)
 
 
 def _n_rows() -> int:
@@ -51,25 +119,73 @@ def _n_cols() -> int:
     return _window.getmaxyx()[1]
 
 
-def _print_row(row: int, msg: str, color: int, highlight : bool = False):
-    # Print a string on a given row in a color with optional highlight.
+def _print_row(row: int,
+               msg: str,
+               color: int,
+               highlight : bool = False,
+               underline: tuple[int, ...] = ()):
+    # Print a string on a given row in a color with optional highlight and
+    # underlined columns.
     if row >= _n_rows():
         return
     attr = curses.A_REVERSE if highlight else curses.A_NORMAL
-    line = curses.newwin(1, max(_n_cols(), len(msg) + 1), row, 0)
-    line.addstr(msg)
-    line.chgat(0, 0, color | attr)
-    line.overwrite(_window)
+    _next_frame[row] = (msg, color | attr, underline, '')
+
+
+def _paint_row(row: int, spec: Optional[RowSpec]):
+    # Paint the contents of a row onto the window, or clear it if empty.
+    if spec == None:
+        _window.move(row, 0)
+        _window.clrtoeol()
+        return
+    msg, attr, underline, panel = spec
+    n_cols = _n_cols()
+    if panel:
+        n_cols -= PANEL_COLS
+    try:
+        _window.addnstr(row, 0, msg.ljust(n_cols), n_cols, attr)
+        if panel:
+            _window.addnstr(row, n_cols, panel.ljust(PANEL_COLS),
+                            PANEL_COLS, COLOR['TEXT'])
+    except curses.error:
+        pass    # Raised after writing the bottom-right cell
+    for col in underline:
+        if col < n_cols:
+            _window.chgat(row, col, 1, attr | curses.A_UNDERLINE)
+
+
+def _flush_frame():
+    # Repaint the rows that changed since the last frame, then place the
+    # cursor.
+    global _frame
+    global _cursor_shown
+    if stats.enabled:
+        start = time.perf_counter()
+    painted = 0
+    n_rows = _n_rows()
+    _frame = (_frame + [None] * n_rows)[:n_rows]
+    for row in range(n_rows):
+        spec = _next_frame.get(row)
+        if spec != _frame[row]:
+            _paint_row(row, spec)
+            _frame[row] = spec
+            painted += 1
+    show_cursor = 0 <= _cursor_col < _n_cols()
+    if show_cursor != _cursor_shown:
+        curses.curs_set(2 if show_cursor else 0)
+        _cursor_shown = show_cursor
+    if show_cursor:
+        _window.move(ROW['PROMPT'], _cursor_col)
+    if stats.enabled:
+        stats.add('window.frames')
+        stats.add('window.rows', painted)
+        stats.add('window.render_seconds', time.perf_counter() - start)
 
 
 def _print_cmd_guide():
     # Print the command guide.
-    row, color = ROW['PROMPT'], COLOR['PROMPT']
-    _print_row(row, CMD_GUIDE['COMMANDS'], color)
-    for col in CMD_GUIDE['UNDERLINE_COLS']:
-        if col >= _n_cols():
-            return
-        _window.chgat(row, col, 1, color | curses.A_UNDERLINE)
+    _print_row(ROW['PROMPT'], CMD_GUIDE['COMMANDS'], COLOR['PROMPT'],
+               underline=tuple(CMD_GUIDE['UNDERLINE_COLS']))
 
 
 def _print_prompt(prompt: str):
@@ -79,12 +195,9 @@ def _print_prompt(prompt: str):
 
 def _print_prompt_cursor(prompt: str):
     # Print a prompt message on the prompt line, showing the cursor.
+    global _cursor_col
     _print_prompt(prompt)
-    if len(prompt) < _n_cols():
-        curses.curs_set(2)
-        _window.move(ROW['PROMPT'], len(prompt))
-    else:
-        curses.curs_set(0)
+    _cursor_col = len(prompt)
 
 
 def _print_msg(msg: str):
@@ -98,47 +211,122 @@ def _print_msgs(pre_msg: str, msg: str):
     _print_msg(msg)
 
 
-def _display_heap(highlight: int = -1):
-    # Display the heap, optionally highlight a row (-1 for no highlight)
-    for i, line in enumerate(_get_lines()):
+def _n_heap_rows() -> int:
+    # Return the number of rows available to display the heap.
+    return max(0, _n_rows() - ROW['HEAP'])
+
+
+def _display_lines(lines: Iterable[str], top: int, highlight: int = -1):
+    # Display lines below the messages, given the index of the first line.
+    # Optionally highlight a line (-1 for no highlight).
+    for i, line in enumerate(lines):
         row = ROW['HEAP'] + i
         if row >= _n_rows():
             return
-        _print_row(row, line, COLOR['TEXT'], i == highlight)
+        _print_row(row, line, COLOR['TEXT'], top + i == highlight)
+
+
+def _display_heap(highlight: int = -1):
+    # Display the visible part of the heap, scrolling to a newly
+    # highlighted row (-1 for no highlight).
+    global _top
+    global _last_highlight
+    n_rows = _n_heap_rows()
+    if highlight != _last_highlight and highlight != -1:
+        _top = min(max(_top, highlight - n_rows + 1), highlight)
+    _last_highlight = highlight
+    _top = max(0, min(_top, _get_size() - n_rows))
+    _display_lines(_get_lines(_top, n_rows), _top, highlight)
+
+
+def _display_panel():
+    # Display the side panel beside the heap rows, if shown and the window
+    # is wide enough.
+    if not _get_panel or _n_cols() < 2 * PANEL_COLS:
+        return
+    for i, line in enumerate(_get_panel()[:_n_heap_rows()]):
+        row = ROW['HEAP'] + i
+        spec = _next_frame.get(row, ('', COLOR['TEXT'], (), ''))
+        _next_frame[row] = spec[:3] + ('│ ' + line,)
+
+
+def _scroll(key: int):
+    # Scroll the heap display according to a scroll key.
+    global _top
+    page = max(1, _n_heap_rows())
+    if key == curses.KEY_PPAGE:
+        _top -= page
+    elif key == curses.KEY_NPAGE:
+        _top += page
+    elif key == curses.KEY_HOME:
+        _top = 0
+    else:
+        _top = _get_size()
 
 
 def _do_get_key(print_prompt: VoidFunc,
                 print_msg: VoidFunc,
-                highlight: int = -1) -> str:
-    # Get key from user input while displaying a prompt and messages.
+                highlight: int = -1,
+                lines: Optional[list[str]] = None) -> str:
+    # Get key from user input while displaying a prompt, messages, and the
+    # heap or the given lines.
     # Optionally hightlight a row (-1 for no highlight).
-    curses.curs_set(0)
+    global _frame
+    global _cursor_col
     while True:
-        _window.erase()
+        _next_frame.clear()
+        _cursor_col = -1
         print_msg()
-        _display_heap(highlight)
-        print_prompt()   # Call last to correctly place cursor
+        if _get_status:
+            _print_row(ROW['STATUS'], _get_status(), COLOR['TEXT'])
+        if lines is None:
+            _display_heap(highlight)
+        else:
+            top = max(0, highlight - _n_heap_rows() + 1)
+            _display_lines(lines[top:], top, highlight)
+        _display_panel()
+        print_prompt()
+        _flush_frame()
+        if stats.enabled:
+            start = time.perf_counter()
         k = _window.getch()
-        if k != curses.KEY_RESIZE:
+        if stats.enabled:
+            stats.add('window.input_seconds', time.perf_counter() - start)
+        if k == -1:
+            if _idle:
+                _idle()
+        elif k == curses.KEY_RESIZE:
+            _window.erase()
+            _frame = []
+        elif lines is None and k in _SCROLL_KEYS:
+            _scroll(k)
+        else:
             return chr(k)
 
 
-def get_key_cmd(msg: str, idx: int) -> str:
+def get_key_cmd(msg: str,
+                idx: int,
+                get_pre_msg: Optional[StatusFunc] = None) -> str:
     """Return key from user input while displaying the command guide.
 
-    Display a message and highlight a row (-1 for no highlight).
+    Display a message and highlight a row (-1 for no highlight).  If given,
+    the line before the message is the text returned by `get_pre_msg` each
+    time the window is drawn.
     """
-    print_msg = lambda: _print_msg(msg)
+    if get_pre_msg:
+        print_msg = lambda: _print_msgs(get_pre_msg(), msg)
+    else:
+        print_msg = lambda: _print_msg(msg)
     return _do_get_key(_print_cmd_guide, print_msg, idx)
 
 
-def get_key_cursor(prompt: str, highlight: int = -1) -> str:
+def get_key_cursor(prompt: str, highlight: int = -1, msg: str = '') -> str:
     """Return key from user input while showing a prompt with a cursor.
 
-    Optionally highlight a row (-1 for no highlight).
+    Optionally highlight a row (-1 for no highlight) and display a message.
     """
     print_prompt = lambda: _print_prompt_cursor(prompt)
-    print_msg = lambda: None
+    print_msg = lambda: _print_msg(msg)
     return _do_get_key(print_prompt, print_msg, highlight)
 
 
@@ -151,3 +339,88 @@ def get_key(prompt: str = '', pre_msg: str = '', msg: str = '') -> str:
     print_msg = lambda: _print_msgs(pre_msg, msg)
     return _do_get_key(print_prompt, print_msg)
 
+
+def get_key_lines(prompt: str, lines: list[str], highlight: int) -> str:
+    """Return key from user input while showing lines in place of the heap.
+
+    Display a prompt and highlight a line (-1 for no highlight).
+    """
+    print_prompt = lambda: _print_prompt(prompt)
+    print_msg = lambda: None
+    return _do_get_key(print_prompt, print_msg, highlight, lines)
+
+
+def show(msg: str):
+    """Display the command guide and a message, without the heap.
+
+    The window is refreshed at once, for use before the heap can be read.
+    """
+    global _cursor_col
+    _next_frame.clear()
+    _cursor_col = -1
+    _print_msg(msg)
+    _print_cmd_guide()
+    _flush_frame()
+    _window.refresh()
+
+
+def wait(is_done: Callable[[], bool], msg: str):
+    """Display a message without the heap until a condition is met.
+
+    `is_done` is checked every `WAIT_DELAY` milliseconds, while the window
+    is redrawn when resized.  Keys pressed meanwhile are left to be read
+    afterwards.
+    """
+    global _frame
+    keys = []
+    _window.timeout(WAIT_DELAY)
+    try:
+        while True:
+            show(msg)
+            if is_done():
+                return
+            k = _window.getch()
+            if k == curses.KEY_RESIZE:
+                _window.erase()
+                _frame = []
+            elif k != -1:
+                keys.append(k)
+    finally:
+        _window.timeout(_idle_delay)
+        for k in reversed(keys):
+            curses.ungetch(k)
+
+
+def set_status(get_status: Optional[StatusFunc]):
+    """Show or hide a status line above the heap.
+
+    The status line is the text returned by `get_status` each time the
+    window is drawn, or hidden if `get_status` is None.
+    """
+    global _get_status
+    _get_status = get_status
+
+
+def set_idle(idle: Optional[VoidFunc], delay: int = 100):
+    """Call a function whenever no key is pressed for a while.
+
+    While waiting for a key, `idle` is called after every `delay`
+    milliseconds without input, then the window is redrawn.  Waiting is
+    without a time limit again if `idle` is None.
+    """
+    global _idle
+    global _idle_delay
+    _idle = idle
+    _idle_delay = delay if idle else -1
+    _window.timeout(_idle_delay)
+
+
+def set_panel(get_panel: Optional[PanelFunc]):
+    """Show or hide a panel of lines beside the heap.
+
+    The panel is the lines returned by `get_panel` each time the window is
+    drawn, or hidden if `get_panel` is None.  It is only shown if the
+    window is wide enough.
+    """
+    global _get_panel
+    _get_panel = get_panel
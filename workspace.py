@@ -0,0 +1,207 @@
+"""Module to keep the heap files of a directory open and switch between them.
+
+Functions
+---------
+init(directory: str, is_higher: CompareStr,
+     compare_batch: Optional[CompareBatch] = None, engine: str = 'multipass',
+     undo_levels: int = 100, memory_limit: int = 256 << 20) -> str
+    Initialize the module, opening the most recently modified heap file.
+files() -> list[str]
+    Return the names of the heap files in the directory.
+current() -> str
+    Return the name of the open heap file.
+switch(name: str) -> str
+    Open another heap file of the directory.
+close()
+    Save the loaded heap files that changed.
+
+Notes
+-----
+One heap file at a time is open in `session`.  A heap file switched away
+from stays loaded, as the state swapped out of `session` with its answers
+and undo history (see `session.swap`), so switching back to it costs
+nothing.  Once the estimated memory of the loaded heap files exceeds the
+limit, the least recently used are saved if they changed and dropped, and
+are loaded from their file again when next opened.
+
+Heap files are the files in the directory, except hidden files, CSV
+exports, and the files kept next to heap files (answers, journals, sockets,
+export progress and files being saved).
+
+When `stats.enabled` is set, heap files loaded from their file, switched to
+while loaded, dropped, and skipped at startup as they failed to load are
+counted.
+"""
+
+import os
+from collections import OrderedDict
+from os.path import isfile, join
+from typing import Optional
+
+import session
+import stats
+from heap import CompareStr, CompareBatch
+from data import (MESSAGE, ORACLE_SUFFIX, JOURNAL_SUFFIX, SOCKET_SUFFIX,
+                  PROGRESS_SUFFIX, CSV_EXTENSION)
+
+# Global Variables
+_directory: str = ''
+_current: str = ''              # Name of the heap file open in `session`
+# Other loaded heap files with their memory, least recently used first
+_loaded: OrderedDict[str, tuple[session.SessionState, int]] = OrderedDict()
+_is_higher: CompareStr = None
+_compare_batch: Optional[CompareBatch] = None
+_engine: str = 'multipass'
+_undo_levels: int = 100
+_memory_limit: int = 256 << 20
+
+# Suffixes of the files that are not heap files
+_OTHER_SUFFIXES = (ORACLE_SUFFIX, JOURNAL_SUFFIX, SOCKET_SUFFIX,
+                   PROGRESS_SUFFIX, CSV_EXTENSION, '.tmp')
+
+
+def init(directory: str,
+         is_higher: CompareStr,
+         compare_batch: Optional[CompareBatch] = None,
+         engine: str = 'multipass',
+         undo_levels: int = 100,
+         memory_limit: int = 256 << 20) -> str:
+    """Initialize the module, opening the most recently modified heap file.
+
+    Heap files that fail to load are skipped for the next most recently
+    modified, and ValueError is raised if none loads.  Return result
+    message.
+
+    Parameters
+    ----------
+    directory : str
+        Directory of the heap files, which must contain one.
+    is_higher : CompareStr
+        Callback function answering a comparison that isn't known.
+    compare_batch : Optional[CompareBatch], default=None
+        Callback function answering a list of comparisons that aren't
+        known.
+    engine : str, default='multipass'
+        Strategy used to order the heaps, one of `heap.ENGINES`.
+    undo_levels : int, default=100
+        Number of operations that can be undone in each heap file.
+    memory_limit : int, default=256 << 20
+        Estimated memory in bytes that the loaded heap files may use,
+        although the open one is always kept.
+    """
+    global _directory
+    global _is_higher
+    global _compare_batch
+    global _engine
+    global _undo_levels
+    global _memory_limit
+    _directory = directory
+    _is_higher = is_higher
+    _compare_batch = compare_batch
+    _engine = engine
+    _undo_levels = undo_levels
+    _memory_limit = memory_limit
+    _loaded.clear()
+    names = files()
+    if not names:
+        raise FileNotFoundError(f"No heap files in {directory}")
+    names.sort(key=lambda name: os.path.getmtime(_path(name)), reverse=True)
+    for name in names:
+        session.swap(None)
+        try:
+            return _open(name)
+        except Exception as e:
+            # Not a heap file after all, so try the next most recent.
+            error = e
+            if stats.enabled:
+                stats.add('workspace.skipped')
+    raise ValueError(f"No heap file in {directory} could be loaded") from error
+
+
+def _path(name: str) -> str:
+    # Return the path of a heap file.
+    return join(_directory, name)
+
+
+def _open(name: str) -> str:
+    # Load a heap file into the emptied session.
+    # Return result message.
+    global _current
+    message = session.init(_path(name), _is_higher, _compare_batch,
+                           engine=_engine, undo_levels=_undo_levels)
+    _current = name
+    if stats.enabled:
+        stats.add('workspace.loads')
+    return message
+
+
+def files() -> list[str]:
+    """Return the names of the heap files in the directory, sorted."""
+    return sorted(name for name in os.listdir(_directory)
+                  if not name.startswith('.')
+                  and not name.endswith(_OTHER_SUFFIXES)
+                  and isfile(_path(name)))
+
+
+def current() -> str:
+    """Return the name of the open heap file."""
+    return _current
+
+
+def switch(name: str) -> str:
+    """Open another heap file of the directory.
+
+    The heap file open until now stays loaded if memory allows.  If the
+    other heap file can't be loaded, the current one stays open.
+
+    Return result message.
+    """
+    global _current
+    if name == _current:
+        return MESSAGE['OPENED'] + name
+    used = session.memory_bytes()
+    state, _ = _loaded.pop(name, (None, 0))
+    _loaded[_current] = session.swap(state), used
+    if state is None:
+        try:
+            message = _open(name)
+        except BaseException:
+            session.swap(_loaded.pop(_current)[0])
+            raise
+    else:
+        _current = name
+        message = MESSAGE['SWITCHED'] + name
+        if stats.enabled:
+            stats.add('workspace.hits')
+    _drop_unused()
+    return message
+
+
+def _drop_unused():
+    # Drop the least recently used heap files, saving them if changed,
+    # until the loaded heap files fit in the memory limit.
+    used = session.memory_bytes() + sum(size for _, size in _loaded.values())
+    while _loaded and used > _memory_limit:
+        name, (state, size) = _loaded.popitem(last=False)
+        used -= size
+        _save_state(name, state)
+        if stats.enabled:
+            stats.add('workspace.drops')
+
+
+def _save_state(name: str, state: session.SessionState):
+    # Save a heap file that isn't open, if it changed.
+    state = session.swap(state)
+    try:
+        if session.is_dirty():
+            session.save(_path(name))
+    finally:
+        session.swap(state)
+
+
+def close():
+    """Save the loaded heap files that changed."""
+    if session.is_dirty():
+        session.save(_path(_current))
+    for name, (state, _) in _loaded.items():
+        _save_state(name, state)